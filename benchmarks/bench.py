@@ -0,0 +1,181 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+"""
+Benchmark addfips table loading, lookups and the command line tool.
+Results are printed as JSON so they can be compared across releases.
+
+    python benchmarks/bench.py --rows 2000000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import addfips
+from addfips import addfips as af_module
+
+# (county, state) pairs mixing exact names, bare names, abbreviations, diacretics and misses.
+LOOKUPS = [
+    ('Kings', 'NY'),
+    ('Kings County', 'New York'),
+    ('Los Angeles County', 'CA'),
+    ('Cook', '17'),
+    ('St. Louis City', 'Missouri'),
+    ('Saint Louis County', 'MO'),
+    ('Ft. Bend County', 'Texas'),
+    ('Añasco Municipio', 'PR'),
+    ('Dona Ana', '35'),
+    ("Prince George's", 'MD'),
+    ('Orleans Parish', 'LA'),
+    ('Juneau', 'AK'),
+    ('Not A County', 'NY'),
+    ('Kings', 'Not A State'),
+    ('Beauft. County', 'NC'),
+]
+STATES = ['NY', 'New York', 'california', '17', 'PR', 'Not A State', 'tx']
+TEXTS = [f'{county}, {state}' for county, state in LOOKUPS]
+
+
+def best_of(func, repeat=5, number=1):
+    """Return the fastest time in seconds of ``number`` calls to func."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+
+def reset_tables():
+    """Forget the shared tables, so the next AddFIPS loads from the CSVs again."""
+    af_module._TABLES.clear()  # pylint: disable=protected-access
+    af_module._STATE_TABLES.clear()  # pylint: disable=protected-access
+
+
+def bench_load():
+    """Time AddFIPS construction for each vintage, with and without shared tables."""
+    results = {}
+    for vintage in af_module.COUNTY_FILES:
+
+        # Tables are loaded on first use, so ask for the county table.
+        def cold(vintage=vintage):
+            reset_tables()
+            return af_module.AddFIPS(vintage)._counties
+
+        results[vintage] = {
+            'cold_s': best_of(cold),
+            'warm_s': best_of(lambda vintage=vintage: af_module.AddFIPS(vintage)._counties, number=1000),
+        }
+    return results
+
+
+def bench_lookups(n=100000):
+    """Time county and state lookups per call, with a warm cache and with no cache."""
+    pairs = [random.choice(LOOKUPS) for _ in range(n)]
+    states = [random.choice(STATES) for _ in range(n)]
+    # Mostly distinct strings, as in free-text address data.
+    texts = [f'{random.choice(TEXTS)} {i}' for i in range(n)]
+
+    def per_call(af, func, args):
+        return best_of(lambda: [func(af, *a) for a in args], repeat=3) / len(args)
+
+    hot, cold = af_module.AddFIPS(), af_module.AddFIPS(cache_size=0)
+    for pair in LOOKUPS:
+        hot.get_county_fips(*pair)
+
+    return {
+        'county_hot_s': per_call(hot, af_module.AddFIPS.get_county_fips, pairs),
+        'county_cold_s': per_call(cold, af_module.AddFIPS.get_county_fips, pairs),
+        'county_many_s': best_of(lambda: cold.get_county_fips_many(*zip(*pairs)), repeat=3) / n,
+        'state_s': per_call(hot, af_module.AddFIPS.get_state_fips, [(s,) for s in states]),
+        'state_many_s': best_of(lambda: hot.get_state_fips_many(states), repeat=3) / n,
+        'extract_many_s': best_of(lambda: hot.extract_fips_many(texts), repeat=3) / n,
+    }
+
+
+def bench_threads(n=200000, threads=(1, 2, 4, 8)):
+    """
+    Measure uncached county lookups per second on one AddFIPS instance shared by a pool of threads.
+    Lookups only scale with the number of threads on a free-threaded (no-GIL) build.
+    """
+    af = af_module.AddFIPS(cache_size=0)
+    pairs = [random.choice(LOOKUPS) for _ in range(n)]
+
+    def lookup(chunk):
+        return [af.get_county_fips(*pair) for pair in chunk]
+
+    results = {'gil_enabled': getattr(sys, '_is_gil_enabled', lambda: True)()}
+    for count in threads:
+        chunks = [pairs[i::count] for i in range(count)]
+        with ThreadPoolExecutor(count) as pool:
+            elapsed = best_of(lambda pool=pool, chunks=chunks: list(pool.map(lookup, chunks)), repeat=3)
+        results[count] = {'lookups_per_s': n / elapsed}
+
+    for count in threads:
+        results[count]['speedup'] = results[count]['lookups_per_s'] / results[threads[0]]['lookups_per_s']
+
+    return results
+
+
+def bench_cli(rows):
+    """Measure rows per second of python -m addfips on a generated CSV, with and without a header."""
+    results = {}
+    with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, 'input.csv')
+        with open(filename, 'w', encoding='utf8') as f:
+            f.write('state,county,value\n')
+            for i in range(rows):
+                county, state = random.choice(LOOKUPS)
+                f.write(f'"{state}","{county}",{i}\n')
+
+        modes = {
+            'header': ['-s', 'state', '-c', 'county', filename],
+            'no_header': ['--no-header', '-s', '1', '-c', '2', filename],
+        }
+        for mode, args in modes.items():
+            cmd = [sys.executable, '-m', 'addfips'] + args
+            elapsed = best_of(lambda cmd=cmd: subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True), repeat=1)
+            results[mode] = {'rows': rows, 'seconds': elapsed, 'rows_per_s': rows / elapsed}
+
+    return results
+
+
+def main():
+    """Run the benchmarks and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='rows in the CLI benchmark file. default: 1000000')
+    parser.add_argument('--output', metavar='FILE', help='write JSON results to this file. default: stdout')
+    parser.add_argument('--seed', type=int, default=0, help='random seed. default: 0')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = {
+        'version': addfips.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'load': bench_load(),
+        'lookup': bench_lookups(),
+        'threads': bench_threads(),
+        'cli': bench_cli(args.rows),
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
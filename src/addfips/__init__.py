@@ -9,8 +9,16 @@
 Add FIPS codes to lists and files that contain the names of US state and counties.
 """
 
-from .addfips import AddFIPS
-
 __version__ = '0.4.2'
 
 __all__ = ['addfips']
+
+
+def __getattr__(name):
+    # Import AddFIPS on first use, so that importing the package is fast.
+    if name == 'AddFIPS':
+        from .addfips import AddFIPS  # pylint: disable=import-outside-toplevel
+
+        return AddFIPS
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
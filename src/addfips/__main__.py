@@ -8,11 +8,31 @@
 
 import argparse
 import csv
+import io
+import os
 import sys
+from collections import deque
+from contextlib import nullcontext
+from itertools import repeat
 from signal import SIG_DFL, SIGPIPE, signal
 
 from . import __version__ as version
 from .addfips import AddFIPS
+from .stats import LookupStats
+
+
+def new_addfips(vintage, stats=False, cache=None, index_dir=None):
+    """
+    An AddFIPS instance, optionally counting lookups, remembering results in a SQLite file,
+    or reading county tables from the indexes in index_dir.
+    """
+    result_cache = None
+    if cache:
+        from .cache import ResultCache  # pylint: disable=import-outside-toplevel
+
+        result_cache = ResultCache(cache)
+
+    return AddFIPS(vintage, stats=LookupStats() if stats else None, result_cache=result_cache, index_dir=index_dir)
 
 
 def unmatched(result):
@@ -27,8 +47,251 @@ def unmatched(result):
     return False
 
 
+# Approximate number of characters of input handled in one piece.
+CHUNK_SIZE = 2**20
+
+
+def read_chunks(f, size=CHUNK_SIZE):
+    """Read text from a file in pieces of about `size` characters that end on a CSV record boundary."""
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+
+        # Extend the chunk to the end of the record, which may contain quoted line breaks.
+        quotes = chunk.count('"')
+        while not chunk.endswith('\n') or quotes % 2:
+            line = f.readline()
+            if not line:
+                break
+            chunk += line
+            quotes += line.count('"')
+
+        yield chunk
+
+
+def column(rows, index):
+    """Get one column from a list of rows. Rows that are too short give None."""
+    try:
+        return [row[index] for row in rows]
+    except IndexError:
+        return [row[index] if index < len(row) else None for row in rows]
+
+
+def column_index(field, fieldnames=None):
+    """Find a field in a header, or convert a one-indexed column number if there is no header."""
+    if fieldnames is None:
+        return int(field) - 1
+
+    return fieldnames.index(field)
+
+
+# Name of the shard for rows whose state can't be found.
+UNKNOWN_SHARD = 'unknown'
+
+
+class ShardWriter:
+    """
+    Write converted CSV text to one file per state in a directory, named by state FIPS code, e.g. 06.csv.
+    Files are created when their first rows arrive, and each starts with the header, if there is one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.header = None
+        self.files = {}
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, pieces):
+        """Write a dict of CSV text keyed by state FIPS code."""
+        for state_fips, text in pieces.items():
+            if state_fips not in self.files:
+                filename = os.path.join(self.directory, f'{state_fips or UNKNOWN_SHARD}.csv')
+                # pylint: disable-next=consider-using-with
+                self.files[state_fips] = open(filename, 'wt', encoding='utf8')
+                if self.header is not None:
+                    csv.writer(self.files[state_fips]).writerow(self.header)
+
+            self.files[state_fips].write(text)
+
+    def close(self):
+        """Close the shard files."""
+        for f in self.files.values():
+            f.close()
+
+
+class Converter:
+    """
+    Add FIPS codes to pieces of CSV text. Rows are handled as lists, and each piece
+    is resolved with one bulk lookup. The AddFIPS instance is built on first use.
+    With ``shards``, the converted text is a dict keyed by the state FIPS code of the rows.
+    With ``combined_index``, the county and state are read from one field, split at the last ``separator``.
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-instance-attributes
+    def __init__(
+        self,
+        vintage,
+        state_index,
+        county_index=None,
+        state=None,
+        delimiter=',',
+        err_unmatched=False,
+        stats=False,
+        cache=None,
+        fuzzy=None,
+        shards=False,
+        combined_index=None,
+        separator=',',
+        index_dir=None,
+    ):
+        self.vintage = vintage
+        self.state_index = state_index
+        self.county_index = county_index
+        self.state = state
+        self.delimiter = delimiter
+        self.err_unmatched = err_unmatched
+        self.stats = stats
+        self.cache = cache
+        self.fuzzy = fuzzy
+        self.shards = shards
+        self.combined_index = combined_index
+        self.separator = separator
+        self.index_dir = index_dir
+        self.addfips = None
+
+    def columns(self, rows):
+        """Get the county and state columns of a list of rows. The state may be one state for all rows."""
+        if self.combined_index is not None:
+            return self.addfips.split_county_state(column(rows, self.combined_index), self.separator)
+
+        return column(rows, self.county_index), self.state if self.state else column(rows, self.state_index)
+
+    def lookup(self, rows):
+        """Get FIPS codes for a list of rows."""
+        if self.county_index is None and self.combined_index is None:
+            return self.addfips.get_state_fips_many(column(rows, self.state_index))
+
+        counties, states = self.columns(rows)
+        if self.fuzzy:
+            return self.addfips.match_county_fips_many(counties, states, self.fuzzy)
+        return self.addfips.get_county_fips_many(counties, states)
+
+    def shard_keys(self, rows, codes):
+        """Get the state FIPS code of each row, which names its shard. Matched counties give their own state."""
+        if self.county_index is None and self.combined_index is None:
+            return codes
+
+        if self.state:
+            states = repeat(self.addfips.get_state_fips(self.state))
+        else:
+            states = self.addfips.get_state_fips_many(self.columns(rows)[1])
+
+        return [code[:2] if code else state_fips for code, state_fips in zip(codes, states)]
+
+    def __call__(self, text):
+        """Return the converted CSV text, the text of unmatched rows, and lookup statistics if they were asked for."""
+        if self.addfips is None:
+            self.addfips = new_addfips(self.vintage, self.stats, self.cache, self.index_dir)
+        elif self.stats:
+            self.addfips.stats = LookupStats()
+
+        rows = [row for row in csv.reader(io.StringIO(text), delimiter=self.delimiter) if row]
+        codes = self.lookup(rows)
+
+        out, err = io.StringIO(), io.StringIO()
+
+        if self.shards:
+            shards = {}
+            for state_fips, code, row in zip(self.shard_keys(rows, codes), codes, rows):
+                if code is None and self.err_unmatched:
+                    csv.writer(err).writerow([code] + row)
+                else:
+                    shards.setdefault(state_fips, []).append([code] + row)
+
+            for state_fips, shard in shards.items():
+                text = io.StringIO()
+                csv.writer(text).writerows(shard)
+                shards[state_fips] = text.getvalue()
+
+            return shards, err.getvalue(), self.addfips.stats
+
+        if self.err_unmatched:
+            csv.writer(out).writerows([code] + row for code, row in zip(codes, rows) if code is not None)
+            # Unmatched rows keep their empty fips column, so they line up with the header.
+            csv.writer(err).writerows([code] + row for code, row in zip(codes, rows) if code is None)
+        else:
+            csv.writer(out).writerows([code] + row for code, row in zip(codes, rows))
+
+        return out.getvalue(), err.getvalue(), self.addfips.stats
+
+
+_converter = None
+
+
+def _init_worker(converter):
+    global _converter  # pylint: disable=global-statement
+    _converter = converter
+
+
+def _convert(text):
+    return _converter(text)
+
+
+def convert_parallel(converter, chunks, jobs):
+    """Convert chunks in a pool of worker processes, yielding results in input order."""
+    from multiprocessing import Pool  # pylint: disable=import-outside-toplevel
+
+    with Pool(jobs, _init_worker, (converter,)) as pool:
+        # Keep a bounded number of chunks in flight so memory use doesn't grow with the input.
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_convert, (chunk,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+
+def convert_arrow(args):
+    """Add FIPS codes to a Parquet file or Arrow IPC stream."""
+    from . import arrow  # pylint: disable=import-outside-toplevel
+
+    addfips = new_addfips(args.vintage, args.stats, args.cache, args.index_dir)
+    with open(args.input, 'rb') as source, open(args.output or '/dev/stdout', 'wb') as sink:
+        arrow.convert(
+            source,
+            sink,
+            args.format,
+            state_field=args.state_field,
+            county_field=args.county_field,
+            state=args.state_name,
+            addfips=addfips,
+        )
+
+    if args.stats:
+        print(addfips.stats, file=sys.stderr)
+
+
 def main():
     """Add FIPS codes to a CSV with state and/or county names."""
+    if sys.argv[1:2] == ['serve']:
+        from .server import main as serve  # pylint: disable=import-outside-toplevel
+
+        return serve(sys.argv[2:])
+
+    if sys.argv[1:2] == ['index']:
+        from .index import main as index  # pylint: disable=import-outside-toplevel
+
+        return index(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Add FIPS codes to a CSV with state and/or county names")
     parser.add_argument('-V', '--version', action='version', version='%(prog)s ' + version)
 
@@ -40,6 +303,13 @@ def main():
         '-s', '--state-field', metavar='FIELD', type=str, help='Read state name or FIPS code from this field'
     )
     group.add_argument('-n', '--state-name', metavar='NAME', type=str, help='Use this state for all rows')
+    group.add_argument(
+        '-k',
+        '--combined-field',
+        metavar='FIELD',
+        type=str,
+        help='Read county and state from this field, e.g. "Kings County, NY". Split at the last --separator',
+    )
 
     parser.add_argument(
         '-c',
@@ -48,6 +318,13 @@ def main():
         type=str,
         help='Read county name from this field. If blank, only state FIPS code will be added',
     )
+    parser.add_argument(
+        '--separator',
+        metavar='SEP',
+        type=str,
+        default=',',
+        help='Separator between county and state in --combined-field. default: ,',
+    )
     parser.add_argument('-v', '--vintage', type=int, help='2000, 2010, or 2015. default: 2015')
     parser.add_argument(
         '--no-header', action='store_false', dest='header', help='Input has no header now, interpret fields as integers'
@@ -56,60 +333,148 @@ def main():
         '-u', '--err-unmatched', action='store_true', help='Print rows that addfips cannot match to stderr'
     )
 
+    parser.add_argument(
+        '-j', '--jobs', metavar='N', type=int, default=1, help='Add FIPS codes using N worker processes. default: 1'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        metavar='CHARS',
+        type=int,
+        default=CHUNK_SIZE,
+        help=f'Read and convert the input in pieces of about this many characters. default: {CHUNK_SIZE}',
+    )
+    parser.add_argument(
+        '--stats', action='store_true', help='Print a summary of county matches and misses to stderr when done'
+    )
+    parser.add_argument(
+        '--fuzzy',
+        metavar='CUTOFF',
+        type=float,
+        help='Match misspelled county names with at least this similarity (0-1), e.g. 0.8',
+    )
+    parser.add_argument(
+        '--cache', metavar='FILE', type=str, help='Remember county results in this SQLite file between runs'
+    )
+    parser.add_argument(
+        '--index-dir',
+        metavar='DIR',
+        type=str,
+        help='Read county tables from the indexes in DIR, made by "addfips index DIR", instead of the bundled CSVs',
+    )
+    parser.add_argument('-o', '--output', metavar='FILE', type=str, help='Output file. default: stdout')
+    parser.add_argument(
+        '--shards',
+        metavar='DIR',
+        type=str,
+        help='Write rows to one CSV per state in DIR, named by state FIPS code (e.g. DIR/06.csv). '
+        f'Rows with an unknown state go to DIR/{UNKNOWN_SHARD}.csv',
+    )
+    parser.add_argument(
+        '-f',
+        '--format',
+        choices=('csv', 'parquet', 'arrow-ipc'),
+        default='csv',
+        help='Input and output format. parquet and arrow-ipc require pyarrow. default: csv',
+    )
+
     parser.set_defaults(delimiter=',', input='/dev/stdin')
 
     args = parser.parse_args()
-    addfips = AddFIPS(args.vintage)
 
-    kwargs = {
-        # This may be None, and that's ... OK.
-        "state_field": args.state_field
-    }
+    if args.chunk_size <= 0:
+        parser.error('--chunk-size must be a positive number')
+
+    if args.stats and args.cache:
+        parser.error('--stats and --cache can\'t be used together')
+
+    if args.format != 'csv':
+        if args.format == 'parquet' and args.output is None:
+            parser.error('--format parquet requires --output')
+        if not args.header or args.err_unmatched or args.jobs > 1 or args.shards or args.combined_field or args.fuzzy:
+            parser.error(
+                '--no-header, --err-unmatched, --jobs, --shards, --combined-field and --fuzzy '
+                'only work with --format csv'
+            )
+        return convert_arrow(args)
 
-    # Check if we're decoding counties or states.
-    if args.county_field:
-        func = addfips.add_county_fips
-        kwargs["county_field"] = args.county_field
-        if args.state_name:
-            kwargs["state"] = args.state_name
+    if args.combined_field and args.county_field:
+        parser.error('--combined-field and --county-field can\'t be used together')
 
+    if args.shards and args.output:
+        parser.error('--shards and --output can\'t be used together')
+
+    if args.shards:
+        output = ShardWriter(args.shards)
+    elif args.output:
+        output = open(args.output, 'wt', encoding='utf8')  # pylint: disable=consider-using-with
     else:
-        func = addfips.add_state_fips
+        output = nullcontext(sys.stdout)
 
-    with open(args.input, 'rt', encoding="utf8") as f:
+    with open(args.input, 'rt', encoding="utf8") as f, output as stdout:
         signal(SIGPIPE, SIG_DFL)
 
         if args.header:
             # Read the header, write a header.
-            reader = csv.DictReader(f, delimiter=args.delimiter)
-            fields = ['fips'] + reader.fieldnames
-            writer = csv.DictWriter(sys.stdout, fields)
-            writer.writeheader()
-
-            if args.err_unmatched:
-                error = csv.DictWriter(sys.stderr, fields)
-
+            fieldnames = next(csv.reader(f, delimiter=args.delimiter))
         else:
             # Don't read a header, don't write a header.
-            kwargs['state_field'] = int(kwargs['state_field']) - 1
+            fieldnames = None
 
-            if 'county_field' in kwargs:
-                kwargs['county_field'] = int(kwargs.get('county_field')) - 1
+        # Check if we're decoding counties or states.
+        combined_index = None
+        try:
+            if args.combined_field:
+                combined_index = column_index(args.combined_field, fieldnames)
+                county_index = state_index = None
+            elif args.county_field:
+                county_index = column_index(args.county_field, fieldnames)
+                state_index = None if args.state_name else column_index(args.state_field, fieldnames)
+            else:
+                county_index = None
+                state_index = column_index(args.state_field or AddFIPS.default_state_field, fieldnames)
+        except (TypeError, ValueError):
+            parser.error('state or county field not found in input')
+
+        if fieldnames is not None:
+            if args.shards:
+                stdout.header = ['fips'] + fieldnames
+            else:
+                csv.writer(stdout).writerow(['fips'] + fieldnames)
 
-            reader = csv.reader(f, delimiter=args.delimiter)
-            writer = csv.writer(sys.stdout)
+        converter = Converter(
+            args.vintage,
+            state_index,
+            county_index,
+            args.state_name,
+            args.delimiter,
+            args.err_unmatched,
+            args.stats,
+            args.cache,
+            args.fuzzy,
+            bool(args.shards),
+            combined_index,
+            args.separator,
+            args.index_dir,
+        )
+        chunks = read_chunks(f, args.chunk_size)
 
-            if args.err_unmatched:
-                error = csv.writer(sys.stderr)
+        if args.jobs > 1:
+            results = convert_parallel(converter, chunks, args.jobs)
+        else:
+            results = map(converter, chunks)
 
-        # Write results, optionally to stderr
-        for row in reader:
-            result = func(row, **kwargs)
+        # Write results, optionally with unmatched rows to stderr
+        total = LookupStats()
+        for out, err, stats in results:
+            stdout.write(out)
+            sys.stderr.write(err)
+            if stats is not None:
+                total.merge(stats)
 
-            if args.err_unmatched and unmatched(result):
-                error.writerow(row)
-            else:
-                writer.writerow(result)
+    if args.stats:
+        print(total, file=sys.stderr)
+
+    return None
 
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+pandas DataFrame accessor for adding FIPS codes. Importing this module registers ``DataFrame.addfips``.
+Requires pandas: pip install addfips[pandas]
+
+    >>> import addfips.accessor
+    >>> df['fips'] = df.addfips.county(county='county', state='state')
+'''
+import numpy as np
+import pandas as pd
+
+from .addfips import AddFIPS
+
+
+@pd.api.extensions.register_dataframe_accessor('addfips')
+class FIPSAccessor:
+
+    """
+    Get state or county FIPS codes for the rows of a DataFrame.
+    Key columns are factorized, so each distinct value or (county, state) pair is looked up once.
+    """
+
+    def __init__(self, df):
+        self._df = df
+
+    def _series(self, codes, fips, categorical):
+        # Index -1 (missing values) picks the None appended to the end.
+        fips = list(fips) + [None]
+
+        if categorical:
+            categories = sorted(set(fips[:-1]) - {None})
+            position = {code: i for i, code in enumerate(categories)}
+            category_codes = np.array([position.get(code, -1) for code in fips])
+            values = pd.Categorical.from_codes(category_codes[codes], categories)
+        else:
+            values = np.array(fips, dtype=object)[codes]
+
+        return pd.Series(values, index=self._df.index, name='fips')
+
+    def state(self, state='state', vintage=None, categorical=False):
+        '''
+        Get a Series of state FIPS codes.
+        :state str column containing state names, postal abbreviations or FIPS codes. default: state
+        :vintage int county vintage. default: latest
+        :categorical bool return a categorical Series instead of strings
+        '''
+        codes, uniques = pd.factorize(self._df[state])
+        return self._series(codes, AddFIPS(vintage).get_state_fips_many(uniques), categorical)
+
+    # pylint: disable-next=too-many-arguments
+    def county(self, county='county', state='state', state_name=None, vintage=None, categorical=False):
+        '''
+        Get a Series of county FIPS codes.
+        :county str column containing county names. default: county
+        :state str column containing state names, postal abbreviations or FIPS codes. default: state
+        :state_name str State name, postal abbreviation or FIPS code to use for all rows
+        :vintage int county vintage. default: latest
+        :categorical bool return a categorical Series instead of strings
+        '''
+        addfips = AddFIPS(vintage)
+        county_codes, counties = pd.factorize(self._df[county])
+
+        if state_name:
+            return self._series(county_codes, addfips.get_county_fips_many(counties, state_name), categorical)
+
+        state_codes, states = pd.factorize(self._df[state])
+
+        # Combine the two sets of codes into one integer key per row, and look up each distinct key once.
+        width = max(len(counties), 1)
+        keys = state_codes.astype('int64') * width + county_codes
+        keys[(state_codes < 0) | (county_codes < 0)] = -1
+        codes, uniques = pd.factorize(keys)
+
+        pairs = [divmod(key, width) if key >= 0 else None for key in uniques]
+        fips = addfips.get_county_fips_many(
+            [counties[pair[1]] if pair else None for pair in pairs],
+            [states[pair[0]] if pair else None for pair in pairs],
+        )
+        return self._series(codes, fips, categorical)
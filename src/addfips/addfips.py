@@ -8,13 +8,31 @@
 Add county FIPS code to a CSV that has state and county names.
 '''
 import csv
+import os
 import re
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import ChainMap, Counter, namedtuple
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import repeat
+from time import perf_counter
+from types import MappingProxyType
 
-try:
-    from importlib.resources import files
-except ImportError:
-    from importlib_resources import files
-
+from .stats import (
+    ABBREVIATION,
+    BARE,
+    CODE,
+    EXACT,
+    NONE_INPUT,
+    OVERLAY,
+    STRIPPED_DIACRETICS,
+    UNKNOWN_COUNTY,
+    UNKNOWN_STATE,
+)
 
 COUNTY_FILES = {
     2000: 'data/counties_2000.csv',
@@ -25,8 +43,23 @@ COUNTY_FILES = {
 
 STATES = 'data/states.csv'
 
+# Counties created, split, merged or renamed between vintages: part or all of the old county became the new one.
+COUNTY_CHANGES = 'data/county_changes.csv'
+
+# Census places (cities, towns, villages and CDPs), with one row for each county a place is in.
+# The bundled file covers large cities; "make places" replaces it with every Census place.
+PLACE_FILES = {
+    2020: 'data/places_2020.csv',
+}
+
 COUNTY_PATTERN = r" (county|city|city and borough|borough|census area|municipio|municipality|district|parish)$"
 
+PLACE_PATTERN = (
+    r" (city|town|village|borough|cdp|municipality|comunidad|zona urbana|city and borough|plantation"
+    r"|metropolitan government|metro government|consolidated government|unified government|urban county)"
+    r"( \(balance\))?$"
+)
+
 DIACRETICS = {
     r"ñ": "n",
     r"'": "",
@@ -41,32 +74,286 @@ DIACRETICS = {
     r"ì": "i",
     r"å": "a",
 }
+DIACRETIC_TABLE = str.maketrans(DIACRETICS)
 ABBREVS = {
     'ft. ': 'fort ',
     'st. ': 'saint ',
     'ste. ': 'sainte ',
 }
 
+# Default number of (county, state) lookups remembered by each AddFIPS instance.
+CACHE_SIZE = 16384
+
+# Default minimum similarity (0-1) for fuzzy county matches, and the number of candidates scored per match.
+FUZZY_CUTOFF = 0.8
+FUZZY_CANDIDATES = 10
+
+# Words of free text, after lowercasing and removing diacretics. Used by extract_fips.
+WORD_PATTERN = r"[a-z0-9]+"
+
+# Lookup tables shared by every AddFIPS instance in the process, keyed by loader and arguments.
+_TABLES = {}
+
+# Distinct county tables for each state. Vintages in which a state's counties didn't change share one table.
+_STATE_TABLES = {}
+
+# Held while building tables, so that each is built once even when threads need it at the same time.
+# Reentrant, because some tables are built from others.
+_TABLES_LOCK = threading.RLock()
+
+# Read-only empty table.
+_EMPTY = MappingProxyType({})
+
+# Statistics of the county lookup caches of an AddFIPS instance, as returned by functools.lru_cache.
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _freeze(table):
+    '''Return a read-only version of a table: dicts become mapping proxies, and lists become tuples.'''
+    if isinstance(table, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in table.items()})
+    if isinstance(table, (list, tuple)):
+        return tuple(_freeze(item) for item in table)
+    if isinstance(table, set):
+        return frozenset(table)
+    return table
+
+
+def _consolidate(state_fips, table):
+    '''Return an identical county table already loaded for another vintage, or register this one.'''
+    table = _freeze(table)
+    tables = _STATE_TABLES.setdefault(state_fips, [])
+    for other in tables:
+        if other == table:
+            return other
+
+    tables.append(table)
+    return table
+
+
+def _sizeof(obj, seen):
+    '''Approximate memory use of obj and the objects it contains, counting shared objects once.'''
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, MappingProxyType):
+        # Count the dict behind the proxy.
+        size += sys.getsizeof(dict(obj))
+
+    if isinstance(obj, (dict, MappingProxyType)):
+        size += sum(_sizeof(key, seen) + _sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (tuple, list)):
+        size += sum(_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, CompactCountyTable):
+        size += _sizeof(obj.names, seen) + _sizeof(obj.codes, seen)
+
+    return size
+
+
+def _text(value):
+    '''A string value, or None for anything else, such as the NaN that pandas and NumPy use for missing values.'''
+    return value if isinstance(value, str) else None
+
+
+def _many(func, values):
+    '''Apply func to each value, calling it only once for each distinct value. Values that aren't strings are None.'''
+    values = [_text(value) for value in values]
+    results = {value: func(value) for value in set(values)}
+    return [results[value] for value in values]
+
+
+def _pairs(counties, states):
+    """
+    List (county, state) pairs. states may be one state for all counties. Values that aren't strings are None.
+    Raises ValueError if there are more or fewer states than counties.
+    """
+    counties = [_text(county) for county in counties]
+    if isinstance(states, str):
+        return list(zip(counties, repeat(states)))
+
+    states = [_text(state) for state in states]
+    if len(states) != len(counties):
+        raise ValueError(f'Got {len(counties)} counties and {len(states)} states')
+    return list(zip(counties, states))
+
+
+def _place_result(codes):
+    """A single county code, a list of county codes for a place in several counties, or None."""
+    if codes is None:
+        return None
+    return codes[0] if len(codes) == 1 else list(codes)
+
+
+def _is_code(value):
+    """Check if a county value is a three-digit county code or five-digit FIPS code, rather than a name."""
+    return isinstance(value, str) and len(value) in (3, 5) and value.isascii() and value.isdigit()
+
+
+def _split(value, separator):
+    """Split a combined "County, ST" value at the last separator. Without a separator, the state is None."""
+    if not isinstance(value, str):
+        return None, None
+
+    county, found, state = value.rpartition(separator)
+    if not found:
+        return value.strip(), None
+
+    return county.strip(), state.strip()
+
+
+def _add_fips(row, fips, append):
+    """Add a FIPS code to a dict, list or tuple row. Dicts and lists are changed in place."""
+    if isinstance(row, tuple):
+        return row + (fips,) if append else (fips,) + row
+
+    try:
+        row['fips'] = fips
+    except TypeError:
+        if append:
+            row.append(fips)
+        else:
+            row.insert(0, fips)
+
+    return row
+
+
+def _trigrams(string):
+    padded = f'  {string} '
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class _PackageFiles:
+
+    """Find the package's data files on first use, since importlib.resources is slow to import."""
+
+    def __get__(self, instance, owner):
+        try:
+            from importlib.resources import files  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            from importlib_resources import files  # pylint: disable=import-outside-toplevel
+
+        data = files('addfips')
+        owner.data = data
+        return data
+
+
+class CompactCountyTable(Mapping):
+
+    """
+    Read-only county table for one state, stored as a sorted tuple of names and an array of county codes.
+    It takes a fraction of the memory of a dict, at the cost of a binary search for each lookup.
+    """
+
+    __slots__ = ('names', 'codes')
+
+    def __init__(self, table):
+        self.names = tuple(sorted(table))
+        self.codes = array('H', (int(table[name]) for name in self.names))
+
+    def _find(self, name):
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return i
+        return -1
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return default if i < 0 else f'{self.codes[i]:03d}'
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return f'{self.codes[i]:03d}'
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
 
 class AddFIPS:
 
-    """Get state or county FIPS codes"""
+    """
+    Get state or county FIPS codes.
+
+    State and county tables are parsed once per process, shared between instances and read-only.
+    Instances are safe to share between threads: tables are frozen when they are built, each thread
+    has its own cache of recent lookups, and nothing else is changed by a lookup. An instance with
+    ``stats`` counts lookups in one LookupStats, which isn't thread-safe.
+    """
 
     default_county_field = 'county'
     default_state_field = 'state'
-    data = files('addfips')
-
-    def __init__(self, vintage=None):
-        # Handle de-diacreticizing
-        self.diacretic_pattern = '(' + ('|'.join(DIACRETICS)) + ')'
-        self.delete_diacretics = lambda x: DIACRETICS[x.group()]
+    data = _PackageFiles()
 
+    # pylint: disable-next=too-many-arguments
+    def __init__(
+        self, vintage=None, cache_size=CACHE_SIZE, compact=False, stats=None, result_cache=None, index_dir=None
+    ):
         if vintage is None or vintage not in COUNTY_FILES:
             vintage = max(COUNTY_FILES.keys())
 
-        self._states, self._state_fips = self._load_state_data()
+        if stats is not None and result_cache is not None:
+            # Stats diagnose every lookup, so results from the cache couldn't be counted.
+            raise ValueError("stats and result_cache can't be used together")
+
+        self.vintage = vintage
+        self.compact = compact
+        self.index_dir = index_dir
+        self.stats = stats
+        self.result_cache = result_cache
+
+        # Remember recent county lookups, in a cache for each thread so that threads don't contend for one.
+        # A cache_size of None is unbounded, 0 disables the cache.
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._caches = weakref.WeakSet()
+        self._caches_lock = threading.Lock()
+
+        # County names added with add_aliases, by state. Replaced, never changed, when aliases are added.
+        self._overlay = _EMPTY
+        self._overlay_digest = ''
+        self._overlay_lock = threading.Lock()
+
+        # Only pay for diagnostics when they're asked for.
+        if stats is not None:
+            self.get_county_fips = self._get_county_fips_instrumented
+
+    def __getattr__(self, name):
+        # Tables are loaded on first use, and then found as ordinary instance attributes.
+        # Threads that race to set one set it to the same shared table.
+        if name in ('_states', '_state_fips'):
+            self._states, self._state_fips = self._shared_table(self._load_state_data)
+        elif name == '_counties':
+            self._counties = self._vintage_table(self.vintage)
+        else:
+            raise AttributeError(f'{type(self).__name__!r} object has no attribute {name!r}')
+        return self.__dict__[name]
+
+    def _shared_table(self, loader, *args):
+        '''Return ``loader(*args)``, building it only once per process.'''
+        key = (loader.__func__, args)
+        try:
+            return _TABLES[key]
+        except KeyError:
+            pass
+
+        with _TABLES_LOCK:
+            if key not in _TABLES:
+                start = perf_counter()
+                _TABLES[key] = _freeze(loader(*args))
+                if self.stats is not None:
+                    self.stats.record_load(f"{loader.__name__}{args}", perf_counter() - start)
 
-        self._counties = self._load_county_data(vintage)
+            return _TABLES[key]
 
     def _load_state_data(self):
         with self.data.joinpath(STATES).open('rt', encoding='utf-8') as f:
@@ -82,41 +369,295 @@ class AddFIPS:
 
         return states, state_fips
 
-    def _load_county_data(self, vintage):
+    def _county_keys(self, name, pattern=COUNTY_PATTERN):
+        """Yield the normalized names a county (or place) can be found by, and the rule that produces each."""
+        # Strip diacretics, remove geography name and yield both
+        county = self._delete_diacretics(name.lower())
+        bare_county = re.sub(pattern, '', county)
+        yield county, EXACT
+        if bare_county != county:
+            yield bare_county, BARE
+
+        # Yield both versions of abbreviated names.
+        for short, full in ABBREVS.items():
+            needle, replace = None, None
+
+            if county.startswith(short):
+                needle, replace = short, full
+            elif county.startswith(full):
+                needle, replace = full, short
+
+            if needle is not None:
+                yield county.replace(needle, replace, 1), ABBREVIATION
+                yield bare_county.replace(needle, replace, 1), ABBREVIATION
+
+    def _parse_county_data(self, vintage):
+        '''Read a vintage's county tables into plain dicts, without sharing them.'''
         with self.data.joinpath(COUNTY_FILES[vintage]).open('rt', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
             counties = {}
+            for statefp, countyfp, name in reader:
+                state = counties.setdefault(statefp, {})
+                for key, _ in self._county_keys(name):
+                    state[key] = countyfp
+
+        return counties
+
+    def _load_county_data(self, vintage):
+        counties = self._parse_county_data(vintage)
+        return {state_fips: _consolidate(state_fips, state) for state_fips, state in counties.items()}
+
+    def _load_county_rules(self, vintage):
+        with self.data.joinpath(COUNTY_FILES[vintage]).open('rt', encoding='utf-8') as f:
+            rules = {}
             for row in csv.DictReader(f):
-                if row['statefp'] not in counties:
-                    counties[row['statefp']] = {}
+                rules.setdefault(row['statefp'], {}).update(self._county_keys(row['name']))
+        return rules
 
-                state = counties[row['statefp']]
+    def _load_place_data(self, vintage):
+        with self.data.joinpath(PLACE_FILES[vintage]).open('rt', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)
+            places = {}
+            for statefp, countyfp, name in reader:
+                state = places.setdefault(statefp, {})
+                for key, _ in self._county_keys(name, PLACE_PATTERN):
+                    # A dict keeps the counties of a place in file order, without repeats.
+                    state.setdefault(key, {})[statefp + countyfp] = None
 
-                # Strip diacretics, remove geography name and add both to dict
-                county = self._delete_diacretics(row['name'].lower())
-                bare_county = re.sub(COUNTY_PATTERN, '', county)
-                state[county] = state[bare_county] = row['countyfp']
+        return {statefp: {key: tuple(codes) for key, codes in state.items()} for statefp, state in places.items()}
 
-                # Add both versions of abbreviated names to the dict.
-                for short, full in ABBREVS.items():
-                    needle, replace = None, None
+    def _load_compact_county_data(self, vintage):
+        # Parsed without sharing, so the dict tables are freed once the compact tables are built.
+        counties = self._parse_county_data(vintage)
+        return {
+            state_fips: _consolidate((state_fips, 'compact'), CompactCountyTable(table))
+            for state_fips, table in counties.items()
+        }
 
-                    if county.startswith(short):
-                        needle, replace = short, full
-                    elif county.startswith(full):
-                        needle, replace = full, short
+    def _county_source(self, vintage):
+        '''Digest of a vintage's county CSV and the version of addfips, which identifies an index built from them.'''
+        import hashlib  # pylint: disable=import-outside-toplevel
 
-                    if needle is not None:
-                        replaced = county.replace(needle, replace, 1)
-                        bare_replaced = bare_county.replace(needle, replace, 1)
-                        state[replaced] = state[bare_replaced] = row['countyfp']
-        return counties
+        from . import __version__  # pylint: disable=import-outside-toplevel
+
+        digest = hashlib.sha1(self.data.joinpath(COUNTY_FILES[vintage]).read_bytes())
+        digest.update(__version__.encode('utf-8'))
+        return digest.digest()
+
+    def _build_index(self, path, vintage):
+        # pylint: disable-next=import-outside-toplevel
+        from .index import build_index
+
+        # Parsed without sharing, so that the process building the index doesn't keep the dict tables.
+        build_index(path, self._parse_county_data(vintage), self._county_source(vintage))
+
+    def _load_indexed_county_data(self, index_dir, vintage):
+        # pylint: disable-next=import-outside-toplevel
+        from .index import CountyIndex, index_path
+
+        # Rebuild an index that is missing, damaged, or was built from other data or by another version of addfips.
+        path = index_path(index_dir, vintage)
+        try:
+            index = CountyIndex(path)
+        except (OSError, ValueError):
+            index = None
+
+        if index is None or index.source != self._county_source(vintage):
+            try:
+                self._build_index(path, vintage)
+                index = CountyIndex(path)
+            except OSError:
+                # The directory can't be written to, say on a read-only deployment. Use the tables in memory.
+                return self._shared_table(self._load_county_data, vintage)
+
+        return index.tables()
+
+    def _vintage_table(self, vintage):
+        if self.index_dir is not None:
+            return self._shared_table(self._load_indexed_county_data, os.fspath(self.index_dir), vintage)
+        if self.compact:
+            return self._shared_table(self._load_compact_county_data, vintage)
+        return self._shared_table(self._load_county_data, vintage)
+
+    def _load_state_names(self):
+        with self.data.joinpath(STATES).open('rt', encoding='utf-8') as f:
+            return {row['fips']: (row['name'], row['postal']) for row in csv.DictReader(f)}
+
+    def _load_county_names(self, vintage):
+        with self.data.joinpath(COUNTY_FILES[vintage]).open('rt', encoding='utf-8') as f:
+            names = {}
+            for row in csv.DictReader(f):
+                # The first name listed for a county is its canonical name, later ones are aliases.
+                names.setdefault(row['statefp'] + row['countyfp'], row['name'])
+        return names
+
+    def _load_county_changes(self):
+        with self.data.joinpath(COUNTY_CHANGES).open('rt', encoding='utf-8') as f:
+            return sorted((int(row['year']), row['old'], row['new']) for row in csv.DictReader(f))
+
+    def _load_crosswalk(self, from_vintage, to_vintage):
+        '''Map each county code of one vintage to the codes of another vintage that cover any of its area.'''
+        changes = self._shared_table(self._load_county_changes)
+        if from_vintage <= to_vintage:
+            steps = [(old, new) for year, old, new in changes if from_vintage < year <= to_vintage]
+        else:
+            steps = [(new, old) for year, old, new in reversed(changes) if to_vintage < year <= from_vintage]
+
+        targets = self._shared_table(self._load_county_names, to_vintage).keys()
+        crosswalk = {}
+        for fips in self._shared_table(self._load_county_names, from_vintage):
+            # Follow the changes in order, then keep the codes that exist in the target vintage.
+            codes = {fips}
+            for source, destination in steps:
+                if source in codes:
+                    codes.add(destination)
+            crosswalk[fips] = tuple(sorted(codes & targets))
+
+        return crosswalk
+
+    def _crosswalk(self, from_vintage, to_vintage):
+        for vintage in (from_vintage, to_vintage):
+            if vintage not in COUNTY_FILES:
+                raise ValueError(f'Unknown vintage: {vintage}')
+
+        return self._shared_table(self._load_crosswalk, from_vintage, to_vintage)
+
+    def _county_table(self, vintage=None):
+        '''Get the county table for a vintage, loading it on first use.'''
+        if vintage is None or vintage == self.vintage:
+            return self._counties
+
+        if vintage not in COUNTY_FILES:
+            raise ValueError(f'Unknown vintage: {vintage}')
+
+        return self._vintage_table(vintage)
+
+    def table_size(self, vintage=None):
+        '''Approximate memory used by the county table of a vintage, in bytes.'''
+        return _sizeof(self._county_table(vintage), set())
+
+    def _load_trigram_index(self, vintage, state_fips):
+        '''Index a state's county names by their character trigrams.'''
+        names = sorted(self._county_table(vintage).get(state_fips, {}))
+        index = {}
+        for i, name in enumerate(names):
+            for gram in _trigrams(name):
+                index.setdefault(gram, []).append(i)
+        return names, index
+
+    def _load_name_trie(self, vintage):
+        '''
+        Build a trie of the words of state names, postal codes and county names.
+        Each node is a dict of the next words, and the None key of a node holds the names that end there:
+        a (state fips, weight) tuple for a state name (weight 2) or postal code (weight 1),
+        and a dict of county FIPS codes keyed by state FIPS code.
+        '''
+        trie = {}
+
+        def leaf(name):
+            node = trie
+            for word in re.findall(WORD_PATTERN, name):
+                node = node.setdefault(word, {})
+            return node.setdefault(None, [None, {}])
+
+        for state_fips, (name, postal) in self._shared_table(self._load_state_names).items():
+            leaf(self._delete_diacretics(name.lower()))[0] = (state_fips, 2)
+            leaf(postal.lower())[0] = (state_fips, 1)
+
+        for state_fips, counties in self._county_table(vintage).items():
+            for key, county_fips in counties.items():
+                leaf(key)[1][state_fips] = state_fips + county_fips
+
+        return trie
 
     def _delete_diacretics(self, string):
-        return re.sub(self.diacretic_pattern, self.delete_diacretics, string)
+        # Most names are plain ASCII, and checking is much faster than translating.
+        if string.isascii() and "'" not in string:
+            return string
+        return string.translate(DIACRETIC_TABLE)
+
+    def _thread_cache(self):
+        '''Get this thread's cache of county lookups, creating it on the thread's first lookup.'''
+        try:
+            return self._local.cached
+        except AttributeError:
+            cached = self._local.cached = lru_cache(maxsize=self.cache_size)(self._get_county_fips)
+            with self._caches_lock:
+                self._caches.add(cached)
+            return cached
+
+    def _cached_county_fips(self, county, state, vintage):
+        return self._thread_cache()(county, state, vintage)
+
+    def cache_info(self):
+        '''Return hits, misses, maxsize and current size of the county lookup caches, summed over running threads.'''
+        with self._caches_lock:
+            infos = [cached.cache_info() for cached in self._caches]
+
+        return CacheInfo(
+            sum(info.hits for info in infos),
+            sum(info.misses for info in infos),
+            self.cache_size,
+            sum(info.currsize for info in infos),
+        )
+
+    def cache_clear(self):
+        '''Empty the county lookup caches of every thread and reset their statistics.'''
+        with self._caches_lock:
+            for cached in self._caches:
+                cached.cache_clear()
+
+    def add_aliases(self, aliases):
+        '''
+        Add county names to this instance, on top of the bundled county tables, e.g. ``{'NYC': '36061'}``.
+        Names are normalized like the bundled names, and take precedence over them.
+        :aliases dict County names and their five-digit FIPS codes
+        '''
+        self._add_overlay((fips[:2], fips[2:], name) for name, fips in aliases.items())
+
+    def load_aliases(self, path):
+        '''
+        Add county names to this instance from a CSV with statefp, countyfp and name columns,
+        the format of the bundled county files.
+        :path str Filename
+        '''
+        with open(path, 'rt', encoding='utf-8', newline='') as f:
+            self._add_overlay((row['statefp'], row['countyfp'], row['name']) for row in csv.DictReader(f))
+
+    def _add_overlay(self, rows):
+        import hashlib  # pylint: disable=import-outside-toplevel
+
+        added = {}
+        for state_fips, county_fips, name in rows:
+            code = state_fips + county_fips
+            if len(state_fips) != 2 or len(code) != 5 or not code.isdigit():
+                raise ValueError(f'Invalid FIPS code for {name!r}: {code}')
+
+            table = added.setdefault(state_fips, {})
+            for key, _ in self._county_keys(name):
+                table[key] = county_fips
+
+        with self._overlay_lock:
+            # Copy only the states that changed, and swap in the new overlay, so lookups in other threads see
+            # either all of the new names or none of them.
+            overlay = dict(self._overlay)
+            for state_fips, table in added.items():
+                overlay[state_fips] = MappingProxyType({**overlay.get(state_fips, _EMPTY), **table})
+
+            # Identifies the overlay in the namespace of persistent results.
+            digest = hashlib.sha1(self._overlay_digest.encode('utf-8'))
+            digest.update(repr(sorted((key, sorted(table.items())) for key, table in added.items())).encode('utf-8'))
+
+            self._overlay = MappingProxyType(overlay)
+            self._overlay_digest = '@' + digest.hexdigest()[:16]
+
+        self.cache_clear()
 
     def get_state_fips(self, state):
         '''Get FIPS code from a state name or postal code'''
-        if state is None:
+        if not isinstance(state, str):
             return None
 
         # Check if we already have a FIPS code
@@ -125,21 +666,398 @@ class AddFIPS:
 
         return self._states.get(state.lower())
 
-    def get_county_fips(self, county, state):
+    def get_county_fips(self, county, state, vintage=None):
         """
         Get a county's FIPS code.
-        :county str County name
+        :county str County name, or a three-digit county code or five-digit FIPS code to validate
         :state str Name, postal abbreviation or FIPS code for a state
+        :vintage int Use the county names of this vintage. default: the instance's vintage
         """
+        try:
+            cached = self._local.cached
+        except AttributeError:
+            cached = self._thread_cache()
+        return cached(county, state, vintage or self.vintage)
+
+    def _get_county_fips_instrumented(self, county, state, vintage=None):
+        vintage = vintage or self.vintage
+        start = perf_counter()
+        fips = self._cached_county_fips(county, state, vintage)
+        elapsed = perf_counter() - start
+        self.stats.record_lookup(self._diagnose(county, state, vintage, fips), elapsed)
+        return fips
+
+    def _diagnose(self, county, state, vintage, fips):
+        """Return the reason a lookup missed, or a tuple of the rules that matched it."""
+        if _is_code(county):
+            return (CODE,) if fips else UNKNOWN_COUNTY
+
+        if not isinstance(county, str) or not isinstance(state, str):
+            return NONE_INPUT
+
+        state_fips = self.get_state_fips(state)
+        if state_fips is None:
+            return UNKNOWN_STATE
+
+        if fips is None:
+            return UNKNOWN_COUNTY
+
+        lowered = county.lower()
+        name = self._delete_diacretics(lowered)
+        if name in self._overlay.get(state_fips, _EMPTY):
+            rule = OVERLAY
+        else:
+            rule = self._shared_table(self._load_county_rules, vintage).get(state_fips, {}).get(name, EXACT)
+        return (rule, STRIPPED_DIACRETICS) if name != lowered else (rule,)
+
+    def _get_county_fips(self, county, state, vintage):
+        if not isinstance(county, str):
+            return None
+
         state_fips = self.get_state_fips(state)
-        counties = self._counties.get(state_fips, {})
+        counties = self._county_table(vintage).get(state_fips, {})
+        if _is_code(county):
+            return self._county_code(county, state_fips, vintage)
 
         try:
             name = self._delete_diacretics(county.lower())
-            return state_fips + counties.get(name)
+            county_fips = counties.get(name)
+            if self._overlay:
+                county_fips = self._overlay.get(state_fips, _EMPTY).get(name, county_fips)
+            return state_fips + county_fips
         except TypeError:
             return None
 
+    def _county_code(self, code, state_fips, vintage):
+        """
+        Validate a three-digit county code or five-digit FIPS code against the counties of a vintage.
+        A five-digit code must be in the state, unless the state is unknown.
+        """
+        if len(code) == 3:
+            code = (state_fips or '') + code
+        elif state_fips and not code.startswith(state_fips):
+            return None
+
+        return code if code in self._shared_table(self._load_county_names, vintage) else None
+
+    def match_county_fips(self, county, state, cutoff=FUZZY_CUTOFF, vintage=None):
+        """
+        Get a county's FIPS code, allowing for misspelled or unusual names.
+        Returns a tuple of the FIPS code and a similarity score between 0 and 1,
+        or (None, 0.0) if no county in the state scores at least ``cutoff``.
+        :county str County name
+        :state str Name, postal abbreviation or FIPS code for a state
+        :cutoff float Minimum similarity score. default: 0.8
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        fips = self.get_county_fips(county, state, vintage)
+        if fips is not None:
+            return fips, 1.0
+
+        vintage = vintage or self.vintage
+        counties = self._county_table(vintage)
+        state_fips = self.get_state_fips(state)
+        if not isinstance(county, str) or state_fips not in counties:
+            return None, 0.0
+
+        from difflib import SequenceMatcher  # pylint: disable=import-outside-toplevel
+
+        names, index = self._shared_table(self._load_trigram_index, vintage, state_fips)
+        name = self._delete_diacretics(county.lower())
+
+        # Only score the names that share the most trigrams with the input.
+        shared = Counter(i for gram in _trigrams(name) for i in index.get(gram, ()))
+        best, score = None, 0.0
+        for i, _ in shared.most_common(FUZZY_CANDIDATES):
+            ratio = SequenceMatcher(None, name, names[i]).ratio()
+            if ratio > score:
+                best, score = names[i], ratio
+
+        if best is None or score < cutoff:
+            return None, 0.0
+
+        return state_fips + counties[state_fips][best], score
+
+    def _get_place_counties(self, place, state):
+        if not isinstance(place, str):
+            return None
+
+        places = self._shared_table(self._load_place_data, max(PLACE_FILES))
+        try:
+            return places.get(self.get_state_fips(state), {}).get(self._delete_diacretics(place.lower()))
+        except AttributeError:
+            return None
+
+    def get_place_fips(self, place, state):
+        """
+        Get the FIPS code of the county that contains a Census place, such as a city, town, village or CDP.
+        Returns a list of county FIPS codes for a place in more than one county, or None for an unknown place.
+        Place data is loaded on first use.
+        :place str Place name, e.g. "Kansas City" or "Kansas City city"
+        :state str Name, postal abbreviation or FIPS code for a state
+        """
+        return _place_result(self._get_place_counties(place, state))
+
+    def get_place_fips_many(self, places, states):
+        """
+        Get county FIPS codes for parallel sequences of place and state names, as with get_place_fips.
+        Each distinct (place, state) pair is looked up only once.
+        :places iterable Place names
+        :states iterable/str Names, postal abbreviations or FIPS codes for states, or one state for all places
+        """
+        pairs = _pairs(places, states)
+        codes = {pair: self._get_place_counties(*pair) for pair in set(pairs)}
+        return [_place_result(codes[pair]) for pair in pairs]
+
+    def extract_fips(self, text, vintage=None):
+        """
+        Find a state and county in free text, such as "Kings County, New York" or "Orleans Parish LA".
+        Returns a tuple of the state FIPS code and the county FIPS code, either of which may be None.
+        The words of the text are scanned once against a trie of state and county names.
+        A county is preferred together with a state that contains it, then a state alone,
+        then a county name that only exists in one state. Longer names and state names win over shorter
+        names and postal codes, except that a state alone is taken from the end of the text, since
+        cities are often named after other states ("Kansas City, MO").
+        :text str Free text
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        if not isinstance(text, str):
+            return None, None
+
+        trie = self._shared_table(self._load_name_trie, vintage or self.vintage)
+        words = re.findall(WORD_PATTERN, self._delete_diacretics(text.lower()))
+
+        # Every (start, end, value) match of a state or county name in the words.
+        states, counties = [], []
+        for start in range(len(words)):
+            node = trie
+            for end in range(start + 1, len(words) + 1):
+                node = node.get(words[end - 1])
+                if node is None:
+                    break
+                if None in node:
+                    state, found = node[None]
+                    if state:
+                        states.append((start, end, state))
+                    if found:
+                        counties.append((start, end, found))
+
+        best, score = None, None
+        for state_start, state_end, (state_fips, weight) in states:
+            for start, end, found in counties:
+                if state_fips in found and (end <= state_start or state_end <= start):
+                    candidate = (end - start, weight, state_end - state_start)
+                    if score is None or candidate > score:
+                        best, score = (state_fips, found[state_fips]), candidate
+
+        if best:
+            return best
+
+        if states:
+            _, _, (state_fips, _) = max(states, key=lambda match: (match[1], match[2][1], match[1] - match[0]))
+            return state_fips, None
+
+        unique = [(end - start, found) for start, end, found in counties if len(found) == 1]
+        if unique:
+            ((state_fips, county_fips),) = max(unique, key=lambda match: match[0])[1].items()
+            return state_fips, county_fips
+
+        return None, None
+
+    def extract_fips_many(self, texts, vintage=None):
+        """
+        Find (state FIPS, county FIPS) tuples in a sequence of free text strings, as with extract_fips.
+        Each distinct string is scanned only once.
+        :texts iterable Free text strings
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        return _many(lambda text: self.extract_fips(text, vintage), texts)
+
+    def get_state_name(self, state):
+        '''Get a state's name from its FIPS code, name or postal code'''
+        return self._shared_table(self._load_state_names).get(self.get_state_fips(state), (None,))[0]
+
+    def get_state_postal(self, state):
+        '''Get a state's postal code from its FIPS code, name or postal code'''
+        return self._shared_table(self._load_state_names).get(self.get_state_fips(state), (None, None))[1]
+
+    def get_county_name(self, fips, vintage=None):
+        """
+        Get a county's name from its five-digit FIPS code.
+        :fips str County FIPS code
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        vintage = vintage or self.vintage
+        if vintage not in COUNTY_FILES:
+            raise ValueError(f'Unknown vintage: {vintage}')
+
+        return self._shared_table(self._load_county_names, vintage).get(fips)
+
+    def translate(self, fips, from_vintage, to_vintage):
+        """
+        Get the five-digit FIPS codes in one vintage for a county in another vintage.
+        Returns a list of the codes that cover any of the county's area: one code for an unchanged or
+        renamed county, several when it was split or merged. Returns an empty list when ``fips`` isn't
+        a county in ``from_vintage``.
+        :fips str County FIPS code in from_vintage
+        :from_vintage int Vintage of the code
+        :to_vintage int Vintage to translate it to
+        """
+        return list(self._crosswalk(from_vintage, to_vintage).get(fips, ()))
+
+    def get_state_fips_many(self, states):
+        '''
+        Get FIPS codes for a sequence of state names, postal codes or FIPS codes.
+        Each distinct value is looked up only once.
+        :states iterable State names, postal abbreviations or FIPS codes
+        '''
+        return _many(self.get_state_fips, states)
+
+    def get_state_name_many(self, states):
+        '''Get names for a sequence of state FIPS codes, names or postal codes. Each distinct value is looked up once'''
+        return _many(self.get_state_name, states)
+
+    def get_state_postal_many(self, states):
+        '''Get postal codes for a sequence of state FIPS codes or names. Each distinct value is looked up once.'''
+        return _many(self.get_state_postal, states)
+
+    def get_county_name_many(self, fips, vintage=None):
+        """
+        Get county names for a sequence of five-digit FIPS codes.
+        Each distinct value is looked up only once.
+        :fips iterable County FIPS codes
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        return _many(lambda code: self.get_county_name(code, vintage), fips)
+
+    def translate_many(self, fips, from_vintage, to_vintage):
+        """
+        Translate a sequence of county FIPS codes from one vintage to another, as with translate.
+        :fips iterable County FIPS codes in from_vintage
+        :from_vintage int Vintage of the codes
+        :to_vintage int Vintage to translate them to
+        """
+        crosswalk = self._crosswalk(from_vintage, to_vintage)
+        return [list(crosswalk.get(code, ())) for code in fips]
+
+    def get_county_fips_many(self, counties, states, vintage=None):
+        """
+        Get FIPS codes for parallel sequences of county and state names.
+        Each distinct (county, state) pair is looked up only once. Pairs are grouped by state,
+        so each distinct state is resolved once and its counties are looked up in its table together.
+        :counties iterable County names
+        :states iterable/str Names, postal abbreviations or FIPS codes for states, or one state for all counties
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        pairs = _pairs(counties, states)
+        if self.stats is not None:
+            # Diagnose every row, not just the distinct pairs.
+            return [self.get_county_fips(county, state, vintage) for county, state in pairs]
+
+        namespace = self._namespace(vintage or self.vintage)
+        codes = self._resolve_many(set(pairs), namespace, lambda missing: self._partition_county_fips(missing, vintage))
+        return [codes[pair] for pair in pairs]
+
+    def _partition_county_fips(self, pairs, vintage=None):
+        """
+        Resolve distinct (county, state) pairs, grouped by the FIPS code of their state.
+        County codes are validated against the set of codes in the vintage, without normalizing names.
+        """
+        counties = self._county_table(vintage)
+        vintage = vintage or self.vintage
+        state_fips = {state: self.get_state_fips(state) for state in {state for _, state in pairs}}
+
+        partitions = {}
+        for pair in pairs:
+            partitions.setdefault(state_fips[pair[1]], []).append(pair)
+
+        codes = {}
+        for fips, partition in partitions.items():
+            table = counties.get(fips, {})
+            if fips in self._overlay:
+                table = ChainMap(self._overlay[fips], table)
+            for county, state in partition:
+                if _is_code(county):
+                    codes[county, state] = self._county_code(county, fips, vintage)
+                    continue
+
+                try:
+                    codes[county, state] = fips + table.get(self._delete_diacretics(county.lower()))
+                except (TypeError, AttributeError):
+                    codes[county, state] = None
+
+        return codes
+
+    @staticmethod
+    def split_county_state(values, separator=','):
+        """
+        Split combined values such as "Kings County, NY" into a list of counties and a list of states.
+        Each value is split at its last separator, and both parts are stripped of whitespace.
+        A value without the separator is taken as the county, with a state of None.
+        :values iterable Combined county and state values
+        :separator str default: ","
+        """
+        pairs = [_split(value, separator) for value in values]
+        return [county for county, _ in pairs], [state for _, state in pairs]
+
+    def get_county_fips_combined(self, value, separator=',', vintage=None):
+        """
+        Get a county's FIPS code from a combined value such as "Kings County, NY".
+        :value str County and state, split at the last separator
+        :separator str default: ","
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        return self.get_county_fips(*_split(value, separator), vintage)
+
+    def get_county_fips_combined_many(self, values, separator=',', vintage=None):
+        """
+        Get FIPS codes for a sequence of combined values such as "Kings County, NY", as with get_county_fips_many.
+        :values iterable County and state values, split at the last separator
+        :separator str default: ","
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        return self.get_county_fips_many(*self.split_county_state(values, separator), vintage)
+
+    def match_county_fips_many(self, counties, states, cutoff=FUZZY_CUTOFF, vintage=None):
+        """
+        Get FIPS codes for parallel sequences of county and state names, allowing for misspelled names.
+        Each distinct (county, state) pair is matched only once. Unlike match_county_fips, only codes are returned.
+        :counties iterable County names
+        :states iterable/str Names, postal abbreviations or FIPS codes for states, or one state for all counties
+        :cutoff float Minimum similarity score. default: 0.8
+        :vintage int Use the county names of this vintage. default: the instance's vintage
+        """
+        pairs = _pairs(counties, states)
+        namespace = self._namespace(vintage or self.vintage, f'~{cutoff}')
+        codes = self._resolve_many(
+            set(pairs),
+            namespace,
+            lambda missing: {pair: self.match_county_fips(*pair, cutoff, vintage)[0] for pair in missing},
+        )
+        return [codes[pair] for pair in pairs]
+
+    def _namespace(self, vintage, mode=''):
+        """
+        Namespace of persistent results: the vintage and matching mode, a digest of the county data and version of
+        addfips, so that results from another release aren't used, and a digest of the aliases.
+        """
+        source = self._shared_table(self._county_source, vintage).hex()[:16]
+        return f'{vintage}{mode}:{source}{self._overlay_digest}'
+
+    def _resolve_many(self, pairs, namespace, resolve):
+        """
+        Resolve distinct (county, state) pairs, using and filling the persistent result cache if there is one.
+        ``resolve`` takes a list of pairs and returns a dict of their codes.
+        """
+        if self.result_cache is None:
+            return resolve(pairs)
+
+        codes = self.result_cache.get_many(namespace, pairs)
+        missing = resolve([pair for pair in pairs if pair not in codes])
+        self.result_cache.set_many(namespace, missing)
+        codes.update(missing)
+        return codes
+
     def add_state_fips(self, row, state_field=None):
         """
         Add state FIPS to a dictionary.
@@ -182,3 +1100,49 @@ class AddFIPS:
             row.insert(0, fips)
 
         return row
+
+    def iter_state_fips(self, rows, state_field=None, append=False, unmatched=False):
+        """
+        Lazily add state FIPS codes to an iterable of rows.
+        :rows iterable dicts, lists or tuples
+        :state_field str/int state name field or index. default: state
+        :append bool Add codes to the end of list and tuple rows, rather than the start
+        :unmatched bool Only yield the rows that couldn't be matched, unchanged
+        """
+        if state_field is None:
+            state_field = self.default_state_field
+
+        for row in rows:
+            fips = self.get_state_fips(row[state_field])
+
+            if not unmatched:
+                yield _add_fips(row, fips, append)
+            elif fips is None:
+                yield row
+
+    # pylint: disable-next=too-many-arguments
+    def iter_county_fips(self, rows, county_field=None, state_field=None, state=None, append=False, unmatched=False):
+        """
+        Lazily add county FIPS codes to an iterable of rows.
+        :rows iterable dicts, lists or tuples
+        :county_field str/int county name field or index. default: county
+        :state_field str/int state name field or index. default: state
+        :state str State name, postal abbreviation or FIPS code to use for all rows
+        :append bool Add codes to the end of list and tuple rows, rather than the start
+        :unmatched bool Only yield the rows that couldn't be matched, unchanged
+        """
+        if county_field is None:
+            county_field = self.default_county_field
+
+        if state_field is None:
+            state_field = self.default_state_field
+
+        state_fips = self.get_state_fips(state) if state else None
+
+        for row in rows:
+            fips = self.get_county_fips(row[county_field], state_fips if state else row[state_field])
+
+            if not unmatched:
+                yield _add_fips(row, fips, append)
+            elif fips is None:
+                yield row
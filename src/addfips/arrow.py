@@ -0,0 +1,112 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+Add FIPS codes to Apache Arrow tables, record batches and Parquet files.
+Requires pyarrow: pip install addfips[arrow]
+'''
+import pyarrow as pa
+import pyarrow.compute
+import pyarrow.ipc
+import pyarrow.parquet
+
+from .addfips import AddFIPS
+
+FORMATS = ('parquet', 'arrow-ipc')
+
+
+def _column(data, name):
+    column = data.column(name)
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    return column.cast(pa.string())
+
+
+def _state_fips(addfips, states):
+    encoded = states.dictionary_encode()
+    codes = pa.array(addfips.get_state_fips_many(encoded.dictionary.to_pylist()), pa.string())
+    return codes.take(encoded.indices)
+
+
+def _county_fips(addfips, counties, states):
+    counties = counties.dictionary_encode()
+
+    if isinstance(states, str):
+        codes = addfips.get_county_fips_many(counties.dictionary.to_pylist(), states)
+        return pa.array(codes, pa.string()).take(counties.indices)
+
+    states = states.dictionary_encode()
+
+    # Combine the two dictionary indices into one integer key per row, and look up each distinct key once.
+    width = max(len(counties.dictionary), 1)
+    keys = pa.compute.multiply(states.indices.cast(pa.int64()), width)
+    keys = pa.compute.add(keys, counties.indices.cast(pa.int64())).dictionary_encode()
+
+    pairs = [divmod(key, width) for key in keys.dictionary.to_pylist()]
+    state_names = states.dictionary.to_pylist()
+    county_names = counties.dictionary.to_pylist()
+    codes = addfips.get_county_fips_many([county_names[c] for _, c in pairs], [state_names[s] for s, _ in pairs])
+
+    return pa.array(codes, pa.string()).take(keys.indices)
+
+
+# pylint: disable-next=too-many-arguments
+def add_fips(data, state_field=None, county_field=None, state=None, addfips=None, field='fips'):
+    '''
+    Add a column of FIPS codes to the front of a pyarrow Table or RecordBatch.
+    Each distinct state name, or (county, state) pair, is looked up once.
+    :data pyarrow.Table/pyarrow.RecordBatch
+    :state_field str state name or FIPS code column. default: state
+    :county_field str county name column. If None, state FIPS codes are added
+    :state str State name, postal abbreviation or FIPS code to use for all rows
+    :addfips AddFIPS instance to use. default: a new AddFIPS with the latest vintage
+    :field str name of the new column. default: fips
+    '''
+    addfips = addfips or AddFIPS()
+    state_field = state_field or addfips.default_state_field
+
+    if county_field is None:
+        fips = _state_fips(addfips, _column(data, state_field))
+    else:
+        states = state or _column(data, state_field)
+        fips = _county_fips(addfips, _column(data, county_field), states)
+
+    return type(data).from_arrays([fips] + list(data.columns), schema=_schema(data.schema, field))
+
+
+def _schema(schema, field):
+    return schema.insert(0, pa.field(field, pa.string()))
+
+
+def add_fips_batches(batches, **kwargs):
+    '''Lazily add FIPS codes to an iterable of RecordBatches. Takes the same keyword arguments as add_fips.'''
+    kwargs.setdefault('addfips', AddFIPS())
+    for batch in batches:
+        yield add_fips(batch, **kwargs)
+
+
+def convert(source, sink, fmt, **kwargs):
+    '''
+    Add FIPS codes to a Parquet file or Arrow IPC stream, one row group or batch at a time.
+    :source str/file input file
+    :sink str/file output file
+    :fmt str 'parquet' or 'arrow-ipc'
+    Other keyword arguments are passed to add_fips.
+    '''
+    if fmt == 'parquet':
+        reader = pa.parquet.ParquetFile(source)
+        schema, batches = reader.schema_arrow, reader.iter_batches()
+        open_writer = pa.parquet.ParquetWriter
+    elif fmt == 'arrow-ipc':
+        batches = pa.ipc.open_stream(source)
+        schema = batches.schema
+        open_writer = pa.ipc.new_stream
+    else:
+        raise ValueError(f'Unknown format: {fmt}')
+
+    # Open the writer before reading, so that an input without rows still gives a valid, empty output.
+    with open_writer(sink, _schema(schema, kwargs.get('field', 'fips'))) as writer:
+        for batch in add_fips_batches(batches, **kwargs):
+            writer.write_batch(batch)
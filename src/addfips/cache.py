@@ -0,0 +1,108 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+Persistent cache of lookup results in an SQLite file, shared between runs and processes.
+'''
+import sqlite3
+import threading
+import time
+
+# Default maximum number of results kept in a cache file.
+MAX_ENTRIES = 1000000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    namespace TEXT NOT NULL,
+    state TEXT NOT NULL,
+    county TEXT NOT NULL,
+    fips TEXT,
+    used REAL NOT NULL,
+    PRIMARY KEY (namespace, state, county)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+'''
+
+
+class ResultCache:
+
+    """
+    Remember (county, state) -> FIPS results, including misses, in an SQLite file.
+    Results are grouped by a namespace, such as the vintage and matching mode.
+    When there are more than ``max_entries`` results, the least recently used are deleted.
+    Each thread opens its own connection on first use, so a ResultCache can be shared by threads
+    and passed to worker processes.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
+
+    @property
+    def connection(self):
+        '''This thread's SQLite connection, opened on first use.'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+        return connection
+
+    def close(self):
+        '''Close this thread's connection.'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def get_many(self, namespace, pairs):
+        '''
+        Get the cached results for (county, state) pairs.
+        Returns a dict of the pairs that were found. Pairs containing None are never cached.
+        '''
+        pairs = [pair for pair in pairs if None not in pair]
+        found = {}
+        with self.connection as connection:
+            for county, state in pairs:
+                row = connection.execute(
+                    'SELECT fips FROM results WHERE namespace = ? AND state = ? AND county = ?',
+                    (namespace, state, county),
+                ).fetchone()
+                if row is not None:
+                    found[county, state] = row[0]
+
+            if found:
+                connection.executemany(
+                    'UPDATE results SET used = ? WHERE namespace = ? AND state = ? AND county = ?',
+                    [(time.time(), namespace, state, county) for county, state in found],
+                )
+        return found
+
+    def set_many(self, namespace, results):
+        '''Store a dict of (county, state) -> FIPS results, and evict old ones if the cache is full.'''
+        rows = [(namespace, state, county, fips, time.time()) for (county, state), fips in results.items()]
+        rows = [row for row in rows if row[1] is not None and row[2] is not None]
+        if not rows:
+            return
+
+        with self.connection as connection:
+            connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+            (count,) = connection.execute('SELECT count(*) FROM results').fetchone()
+            if count > self.max_entries:
+                connection.execute(
+                    'DELETE FROM results WHERE used <= (SELECT used FROM results ORDER BY used LIMIT 1 OFFSET ?)',
+                    (count - self.max_entries - 1,),
+                )
+
+    def __len__(self):
+        (count,) = self.connection.execute('SELECT count(*) FROM results').fetchone()
+        return count
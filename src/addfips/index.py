@@ -0,0 +1,221 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+Binary county index files, read with mmap so that every process on a machine shares one copy of the tables.
+Pass ``index_dir`` to AddFIPS to use them. An index is built from the bundled CSVs the first time it's needed,
+or ahead of time with ``addfips index DIR``.
+
+An index holds, in native byte order:
+
+    header    magic, format version, byte order, source digest, number of states, number of names, number of slots
+    states    for each state: its two-digit FIPS code, and the positions of its first and after its last name
+    offsets   (names + 1) uint32 offsets of each name in the names blob, aligned to 4 bytes
+    slots     uint32 hash table of names, each slot holding a name's position + 1, or 0 when empty
+    codes     uint16 county code of each name
+    names     the normalized county names, UTF-8, sorted by state and then bytewise
+
+A name is found by hashing its state and name with CRC-32, and probing the slots from there.
+The source digest identifies the CSV and the version of addfips an index was built from, so that a stale
+index can be rebuilt.
+'''
+import argparse
+import binascii
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+MAGIC = b'AFIX'
+VERSION = 2
+BYTEORDER = sys.byteorder[0].encode('ascii')
+HEADER = struct.Struct('=4sHcx20sIII')
+STATE = struct.Struct('=2sII')
+
+
+def _align(position):
+    return (position + 3) & ~3
+
+
+def _hash(state_fips, key):
+    return binascii.crc32(key, binascii.crc32(state_fips))
+
+
+def index_path(index_dir, vintage):
+    '''Path of the county index for a vintage.'''
+    return os.path.join(index_dir, f'counties_{vintage}.idx')
+
+
+def build_index(path, counties, source=b''):
+    '''
+    Write county tables, ``{state fips: {name: county fips}}``, to an index file.
+    ``source`` is a digest of up to 20 bytes identifying the data the tables were built from.
+    The file is replaced atomically, so processes may build the same index at once.
+    '''
+    states, names, hashes, codes = [], [], [], array('H')
+    for state_fips in sorted(counties):
+        table = counties[state_fips]
+        start = len(names)
+        for name in sorted(name.encode('utf-8') for name in table):
+            names.append(name)
+            hashes.append(_hash(state_fips.encode('ascii'), name))
+            codes.append(int(table[name.decode('utf-8')]))
+        states.append(STATE.pack(state_fips.encode('ascii'), start, len(names)))
+
+    offsets = array('I', [0])
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    # At most half full, so that probes are short.
+    size = 1 << (2 * len(names)).bit_length()
+    slots = array('I', bytes(4 * size))
+    for i, value in enumerate(hashes):
+        slot = value & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = i + 1
+
+    head = HEADER.pack(MAGIC, VERSION, BYTEORDER, source, len(states), len(names), size) + b''.join(states)
+    head += bytes(_align(len(head)) - len(head))
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(head)
+            f.write(offsets.tobytes())
+            f.write(slots.tobytes())
+            f.write(codes.tobytes())
+            f.write(b''.join(names))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class CountyIndex:
+
+    """
+    A county index file, mapped read-only into memory. Pages are read from the file as they're needed,
+    and the operating system keeps one copy of them for all the processes that map the file.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, byteorder, self.source, state_count, count, size = HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic = version = byteorder = None
+
+        if (magic, version, byteorder) != (MAGIC, VERSION, BYTEORDER):
+            self._mmap.close()
+            raise ValueError(f'Not a county index for this version of addfips: {path}')
+
+        # A file cut short, say by a full disk, has a good header, so check its size against the header.
+        offsets = _align(HEADER.size + STATE.size * state_count)
+        names = offsets + 4 * (count + 1) + 4 * size + 2 * count
+        length = len(self._mmap)
+        if length < names or length != names + struct.unpack_from('=I', self._mmap, offsets + 4 * count)[0]:
+            self._mmap.close()
+            raise ValueError(f'County index is truncated: {path}')
+
+        position = HEADER.size
+        self.states = {}
+        for _ in range(state_count):
+            state_fips, start, stop = STATE.unpack_from(self._mmap, position)
+            self.states[state_fips.decode('ascii')] = (start, stop)
+            position += STATE.size
+
+        view = memoryview(self._mmap)
+        position = _align(position)
+        self.offsets = view[position : position + 4 * (count + 1)].cast('I')
+        position += 4 * (count + 1)
+        self.slots = view[position : position + 4 * size].cast('I')
+        position += 4 * size
+        self.codes = view[position : position + 2 * count].cast('H')
+        self._names = position + 2 * count
+
+    def name(self, i):
+        '''The UTF-8 encoded name at position i.'''
+        return self._mmap[self._names + self.offsets[i] : self._names + self.offsets[i + 1]]
+
+    def find(self, state_fips, name, start, stop):
+        '''Position of a name in a state, whose names are between positions start and stop, or -1.'''
+        try:
+            key = name.encode('utf-8')
+        except (AttributeError, UnicodeEncodeError):
+            return -1
+
+        data, offsets, slots, names = self._mmap, self.offsets, self.slots, self._names
+        mask = len(slots) - 1
+        slot = _hash(state_fips, key) & mask
+        while slots[slot]:
+            i = slots[slot] - 1
+            if start <= i < stop and data[names + offsets[i] : names + offsets[i + 1]] == key:
+                return i
+            slot = (slot + 1) & mask
+        return -1
+
+    def tables(self):
+        '''County tables for each state, as a dict of state FIPS codes to IndexedCountyTables.'''
+        return {state: IndexedCountyTable(self, state, start, stop) for state, (start, stop) in self.states.items()}
+
+
+class IndexedCountyTable(Mapping):
+
+    """Read-only county table for one state in a CountyIndex."""
+
+    __slots__ = ('index', 'state_fips', 'start', 'stop')
+
+    def __init__(self, index, state_fips, start, stop):
+        self.index = index
+        self.state_fips = state_fips.encode('ascii')
+        self.start = start
+        self.stop = stop
+
+    def _find(self, name):
+        return self.index.find(self.state_fips, name, self.start, self.stop)
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return default if i < 0 else f'{self.index.codes[i]:03d}'
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return f'{self.index.codes[i]:03d}'
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return (self.index.name(i).decode('utf-8') for i in range(self.start, self.stop))
+
+    def __len__(self):
+        return self.stop - self.start
+
+
+def main(argv=None):
+    """Build county indexes for every vintage."""
+    # pylint: disable-next=import-outside-toplevel
+    from .addfips import COUNTY_FILES, AddFIPS
+
+    parser = argparse.ArgumentParser(prog='addfips index', description='Build memory-mapped county indexes')
+    parser.add_argument('directory', help='Directory to write the indexes to')
+    parser.add_argument(
+        '-v', '--vintage', type=int, action='append', choices=COUNTY_FILES, help='Vintage to build. default: all'
+    )
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.directory, exist_ok=True)
+    for vintage in args.vintage or COUNTY_FILES:
+        # pylint: disable-next=protected-access
+        AddFIPS(vintage)._build_index(index_path(args.directory, vintage), vintage)
+        print(index_path(args.directory, vintage))
@@ -0,0 +1,228 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+Local HTTP service for FIPS lookups, and an async client for it.
+
+One process holds a single AddFIPS instance for every vintage, and answers batched JSON requests:
+
+    POST /county  {"counties": ["Kings", ...], "states": ["NY", ...], "vintage": 2010}
+    POST /state   {"states": ["New York", ...]}
+
+Both return {"fips": [...]}. "states" in a county request may also be a single state for all counties.
+'''
+import argparse
+import asyncio
+import json
+from http import HTTPStatus
+
+from .addfips import AddFIPS
+
+# Largest request body accepted, in bytes.
+MAX_BODY = 64 * 2**20
+
+
+class Server:
+
+    """
+    Answer FIPS lookups over HTTP/1.1 on a TCP or Unix socket.
+    Requests are resolved in the event loop's default thread pool, so a large batch doesn't hold up other connections.
+    """
+
+    def __init__(self, addfips=None):
+        self.addfips = addfips or AddFIPS()
+
+    def county(self, request):
+        """Resolve a county request."""
+        return self.addfips.get_county_fips_many(request['counties'], request['states'], request.get('vintage'))
+
+    def state(self, request):
+        """Resolve a state request."""
+        return self.addfips.get_state_fips_many(request['states'])
+
+    def respond(self, method, path, body):
+        """Return the status and JSON response for a request."""
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'use POST'}
+
+        lookup = {'/county': self.county, '/state': self.state}.get(path)
+        if lookup is None:
+            return HTTPStatus.NOT_FOUND, {'error': f'unknown path: {path}'}
+
+        try:
+            return HTTPStatus.OK, {'fips': lookup(json.loads(body))}
+        except (KeyError, ValueError, TypeError, AttributeError) as err:
+            return HTTPStatus.BAD_REQUEST, {'error': f'bad request: {err!r}'}
+
+    async def handle(self, reader, writer):
+        """Handle the requests on one connection, which is kept open until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    status, response = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'request too large'}
+                    headers['connection'] = 'close'
+                else:
+                    # Bulk lookups and first loads of a table take a while, so run them off the event loop.
+                    body = await reader.readexactly(length)
+                    loop = asyncio.get_running_loop()
+                    status, response = await loop.run_in_executor(None, self.respond, method, path, body)
+
+                close = headers.get('connection', '').lower() == 'close'
+                extra = 'Connection: close\r\n' if close else ''
+                payload = json.dumps(response).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n{extra}\r\n'.encode('latin-1')
+                    + payload
+                )
+                await writer.drain()
+
+                if close:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8787, path=None):
+        """Start listening on a Unix socket at ``path``, or on ``host`` and ``port``."""
+        if path:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8787, path=None):
+        """Listen until cancelled."""
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+
+class AsyncClient:
+
+    """
+    Client for the addfips service. Requests on one client share a connection.
+
+        async with AsyncClient(port=8787) as client:
+            codes = await client.get_county_fips_many(['Kings', 'Cook'], ['NY', 'IL'])
+    """
+
+    def __init__(self, host='127.0.0.1', port=8787, path=None):
+        self.host, self.port, self.path = host, port, path
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Close the connection to the server."""
+        if self._connection is not None:
+            self._connection[1].close()
+            self._connection = None
+
+    async def _exchange(self, path, body):
+        reader, writer = self._connection
+        payload = json.dumps(body).encode('utf-8')
+        writer.write(
+            f'POST {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n'.encode('latin-1')
+            + payload
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('The addfips service closed the connection')
+
+        status, length, close = int(status_line.split()[1]), 0, False
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            key = key.strip().lower()
+            if key == 'content-length':
+                length = int(value)
+            elif key == 'connection':
+                close = value.strip().lower() == 'close'
+
+        return status, close, json.loads(await reader.readexactly(length))
+
+    async def _request(self, path, body):
+        async with self._lock:
+            if self._connection is None:
+                if self.path:
+                    self._connection = await asyncio.open_unix_connection(self.path)
+                else:
+                    self._connection = await asyncio.open_connection(self.host, self.port)
+
+            # A connection that fails, or that the server closes, is dropped, and the next request opens a new one.
+            try:
+                status, close, response = await self._exchange(path, body)
+            except BaseException:
+                await self.close()
+                raise
+
+            if close:
+                await self.close()
+
+        if status != HTTPStatus.OK:
+            raise ValueError(response.get('error'))
+
+        return response['fips']
+
+    async def get_state_fips_many(self, states):
+        '''Get FIPS codes for a sequence of state names, postal codes or FIPS codes.'''
+        return await self._request('/state', {'states': list(states)})
+
+    async def get_county_fips_many(self, counties, states, vintage=None):
+        """
+        Get FIPS codes for parallel sequences of county and state names.
+        :states iterable/str Names, postal abbreviations or FIPS codes for states, or one state for all counties
+        """
+        states = states if isinstance(states, str) else list(states)
+        return await self._request('/county', {'counties': list(counties), 'states': states, 'vintage': vintage})
+
+    async def get_state_fips(self, state):
+        '''Get FIPS code from a state name or postal code'''
+        return (await self.get_state_fips_many([state]))[0]
+
+    async def get_county_fips(self, county, state, vintage=None):
+        """Get a county's FIPS code."""
+        return (await self.get_county_fips_many([county], [state], vintage))[0]
+
+
+def main(argv=None):
+    """Run the addfips lookup service."""
+    parser = argparse.ArgumentParser(prog='addfips serve', description='Serve FIPS lookups over local HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='default: 127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787, help='default: 8787')
+    parser.add_argument('--socket', metavar='PATH', help='Listen on this Unix socket instead of a TCP port')
+    parser.add_argument('-v', '--vintage', type=int, help='Default vintage for county lookups')
+    args = parser.parse_args(argv)
+
+    server = Server(AddFIPS(args.vintage))
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,94 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+'''
+Counters and timings for AddFIPS lookups. Pass ``stats=LookupStats()`` to AddFIPS to collect them.
+'''
+from collections import Counter
+
+# Reasons a county lookup can miss.
+NONE_INPUT = 'none_input'
+UNKNOWN_STATE = 'unknown_state'
+UNKNOWN_COUNTY = 'unknown_county'
+
+# Rules that can match a county name.
+EXACT = 'exact'
+BARE = 'bare'
+ABBREVIATION = 'abbreviation'
+STRIPPED_DIACRETICS = 'diacretics'
+CODE = 'code'
+OVERLAY = 'overlay'
+
+
+def _bucket(seconds):
+    '''Histogram bucket for a duration: the smallest power of two microseconds that is at least as long.'''
+    return 1 << int(seconds * 1e6).bit_length()
+
+
+class LookupStats:
+
+    """
+    Diagnostics for county lookups.
+    ``hits`` and ``misses`` count lookups, ``reasons`` counts misses by reason,
+    ``rules`` counts the rule that matched each hit (``diacretics`` is counted in addition
+    to the name rule when stripping diacretics was needed, ``code`` matches counties given as
+    FIPS codes and ``overlay`` matches names added with add_aliases), ``lookup_times`` is a histogram
+    of lookup durations in power-of-two microsecond buckets, and ``load_times`` lists the
+    tables loaded and how long each took, in seconds.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.reasons = Counter()
+        self.rules = Counter()
+        self.lookup_times = Counter()
+        self.load_times = []
+
+    def record_lookup(self, outcome, seconds):
+        '''Count one lookup. ``outcome`` is a miss reason, or a tuple of the rules that matched.'''
+        if isinstance(outcome, tuple):
+            self.hits += 1
+            self.rules.update(outcome)
+        else:
+            self.misses += 1
+            self.reasons[outcome] += 1
+        self.lookup_times[_bucket(seconds)] += 1
+
+    def record_load(self, table, seconds):
+        '''Record the time taken to build a table.'''
+        self.load_times.append((table, seconds))
+
+    def merge(self, other):
+        '''Add the counts of another LookupStats to this one.'''
+        self.hits += other.hits
+        self.misses += other.misses
+        self.reasons.update(other.reasons)
+        self.rules.update(other.rules)
+        self.lookup_times.update(other.lookup_times)
+        self.load_times.extend(other.load_times)
+
+    def as_dict(self):
+        '''Return the statistics as a dictionary.'''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'reasons': dict(self.reasons),
+            'rules': dict(self.rules),
+            'lookup_times': {f'<{bucket}us': count for bucket, count in sorted(self.lookup_times.items())},
+            'load_times': [{'table': table, 'seconds': seconds} for table, seconds in self.load_times],
+        }
+
+    def __str__(self):
+        total = self.hits + self.misses
+        lines = [f'lookups: {total}', f'hits: {self.hits}', f'misses: {self.misses}']
+        lines.extend(f'  {reason}: {count}' for reason, count in self.reasons.most_common())
+        lines.append('rules:')
+        lines.extend(f'  {rule}: {count}' for rule, count in self.rules.most_common())
+        lines.append('lookup time:')
+        lines.extend(f'  <{bucket}us: {count}' for bucket, count in sorted(self.lookup_times.items()))
+        lines.append('loads:')
+        lines.extend(f'  {table}: {seconds:.4f}s' for table, seconds in self.load_times)
+        return '\n'.join(lines)
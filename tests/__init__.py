@@ -6,4 +6,4 @@
 
 """Tests for addFIPS."""
 
-__all__ = ['test_base', 'test_cli']
+__all__ = ['test_accessor', 'test_arrow', 'test_base', 'test_cache', 'test_cli', 'test_index', 'test_server']
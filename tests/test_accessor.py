@@ -0,0 +1,68 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+# pylint: disable=missing-docstring,invalid-name
+import unittest
+
+try:
+    import numpy as np
+    import pandas as pd
+
+    import addfips.accessor  # pylint: disable=unused-import
+except ImportError:
+    pd = None
+
+from addfips.addfips import AddFIPS
+
+
+@unittest.skipIf(pd is None, 'pandas is not installed')
+class TestAccessor(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                'st': ['NY', 'New York', 'IL', None, 'NY', 'NY'],
+                'county': ['Kings', 'Niagara', 'Cook', 'Kings', 'foo', None],
+            },
+            index=[10, 11, 12, 13, 14, 15],
+        )
+
+    def test_county(self):
+        fips = self.df.addfips.county(state='st')
+        self.assertEqual(fips.fillna('').tolist(), ['36047', '36063', '17031', '', '', ''])
+        self.assertEqual(fips.index.tolist(), self.df.index.tolist())
+        self.assertEqual(fips.name, 'fips')
+
+    def test_county_state_name(self):
+        fips = self.df.addfips.county(state_name='NY')
+        self.assertEqual(fips.fillna('').tolist(), ['36047', '36063', '', '36047', '', ''])
+
+    def test_categorical(self):
+        fips = self.df.addfips.county(state='st', categorical=True)
+        self.assertEqual(fips.dtype, 'category')
+        self.assertEqual(fips.cat.categories.tolist(), ['17031', '36047', '36063'])
+        self.assertEqual(fips.isna().tolist(), [False, False, False, True, True, True])
+        self.assertEqual(fips.tolist()[:3], ['36047', '36063', '17031'])
+
+    def test_state(self):
+        fips = self.df.addfips.state('st')
+        self.assertEqual(fips.fillna('').tolist(), ['36', '36', '17', '', '36', '36'])
+
+    def test_bulk_missing_values(self):
+        # The bulk methods take Series and arrays, with their missing values and dtypes.
+        af = AddFIPS()
+        self.assertEqual(af.get_state_fips_many(pd.Series(['NY', None])), ['36', None])
+        self.assertEqual(af.get_county_fips_many(['Kings', 'Kings'], pd.Series(['NY', np.nan])), ['36047', None])
+        self.assertEqual(af.get_county_fips_many(pd.Series(['Kings', np.nan]), 'NY'), ['36047', None])
+        self.assertEqual(af.get_state_fips_many(np.array([36, 17])), [None, None])
+        self.assertEqual(af.get_state_fips_many(np.array(['NY', 'IL'])), ['36', '17'])
+
+    def test_vintage(self):
+        df = pd.DataFrame({'state': ['VA'], 'county': ['Clifton Forge']})
+        self.assertEqual(df.addfips.county(vintage=2000).tolist(), ['51560'])
+        self.assertTrue(df.addfips.county().isna().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
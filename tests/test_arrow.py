@@ -0,0 +1,96 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+# pylint: disable=missing-docstring,invalid-name
+import io
+import subprocess
+import tempfile
+import unittest
+from os import path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet
+
+    from addfips import arrow
+except ImportError:
+    pa = None
+
+
+@unittest.skipIf(pa is None, 'pyarrow is not installed')
+class TestArrow(unittest.TestCase):
+    def setUp(self):
+        self.table = pa.table(
+            {
+                'state': ['NY', 'New York', 'IL', None, 'NY'],
+                'county': ['Kings', 'Niagara', 'Cook', 'Kings', 'foo'],
+            }
+        )
+
+    def test_county(self):
+        result = arrow.add_fips(self.table, county_field='county')
+        self.assertEqual(result.schema.names, ['fips', 'state', 'county'])
+        self.assertEqual(result.column('fips').to_pylist(), ['36047', '36063', '17031', None, None])
+
+    def test_county_state_name(self):
+        result = arrow.add_fips(self.table, county_field='county', state='NY')
+        self.assertEqual(result.column('fips').to_pylist(), ['36047', '36063', None, '36047', None])
+
+    def test_state(self):
+        result = arrow.add_fips(self.table.to_batches()[0], field='statefp')
+        self.assertIsInstance(result, pa.RecordBatch)
+        self.assertEqual(result.column(0).to_pylist(), ['36', '36', '17', None, '36'])
+
+    def test_ipc_stream(self):
+        source, sink = io.BytesIO(), io.BytesIO()
+        with pa.ipc.new_stream(source, self.table.schema) as writer:
+            writer.write_table(self.table)
+
+        source.seek(0)
+        arrow.convert(source, sink, 'arrow-ipc', county_field='county')
+        result = pa.ipc.open_stream(sink.getvalue()).read_all()
+        self.assertEqual(result.column('fips').to_pylist(), ['36047', '36063', '17031', None, None])
+
+    def test_empty(self):
+        source, sink = io.BytesIO(), io.BytesIO()
+        pa.parquet.write_table(self.table.slice(0, 0), source)
+        source.seek(0)
+        arrow.convert(source, sink, 'parquet', county_field='county')
+        result = pa.parquet.read_table(io.BytesIO(sink.getvalue()))
+        self.assertEqual(result.schema.names, ['fips', 'state', 'county'])
+        self.assertEqual(result.num_rows, 0)
+
+        source, sink = io.BytesIO(), io.BytesIO()
+        pa.ipc.new_stream(source, self.table.schema).close()
+        source.seek(0)
+        arrow.convert(source, sink, 'arrow-ipc')
+        result = pa.ipc.open_stream(sink.getvalue()).read_all()
+        self.assertEqual(result.schema.names, ['fips', 'state', 'county'])
+        self.assertEqual(result.num_rows, 0)
+
+    def test_parquet_cli(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            source, sink = path.join(dirname, 'in.parquet'), path.join(dirname, 'out.parquet')
+            pa.parquet.write_table(self.table, source, row_group_size=2)
+            subprocess.run(['addfips', source, '-s', 'state', '-c', 'county', '-f', 'parquet', '-o', sink], check=True)
+            result = pa.parquet.read_table(sink)
+
+        self.assertEqual(result.column('fips').to_pylist(), ['36047', '36063', '17031', None, None])
+
+    def test_cli_options(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            source, sink = path.join(dirname, 'in.parquet'), path.join(dirname, 'out.parquet')
+            pa.parquet.write_table(self.table, source)
+            args = ['addfips', source, '-s', 'state', '-c', 'county', '-f', 'parquet', '-o', sink]
+            p = subprocess.run(args + ['--stats'], check=True, capture_output=True, text=True)
+            self.assertIn('hits: 3', p.stderr)
+
+            p = subprocess.run(args + ['--fuzzy', '0.8'], capture_output=True, text=True, check=False)
+            self.assertEqual(p.returncode, 2)
+            self.assertIn('--fuzzy', p.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,14 @@
 # http://opensource.org/licenses/GPL-3.0
 # Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
 # pylint: disable=missing-docstring,invalid-name,protected-access
+import os
 import re
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from unittest import mock
 
 try:
     from importlib.resources import files
@@ -14,6 +20,7 @@ except ImportError:
     from importlib_resources import files
 
 from addfips import addfips
+from addfips.stats import LookupStats
 
 
 class TestAddFips(unittest.TestCase):
@@ -21,16 +28,104 @@ class TestAddFips(unittest.TestCase):
         self.af = addfips.AddFIPS()
 
     def test_basics(self):
-        assert isinstance(self.af._states, dict)
-        assert isinstance(self.af._counties, dict)
+        assert isinstance(self.af._states, MappingProxyType)
+        assert isinstance(self.af._counties, MappingProxyType)
+
+    def test_frozen(self):
+        with self.assertRaises(TypeError):
+            self.af._counties['36']['foo'] = '999'
+        with self.assertRaises(TypeError):
+            self.af._states['foo'] = '99'
+        self.assertIsInstance(self.af._shared_table(self.af._load_county_changes), tuple)
+
+    def test_shared_tables(self):
+        other = addfips.AddFIPS()
+        self.assertIs(other._counties, self.af._counties)
+        self.assertIs(other._states, self.af._states)
+        self.assertIsNot(addfips.AddFIPS(2000)._counties, self.af._counties)
+        self.assertIs(addfips.AddFIPS(2000)._counties, addfips.AddFIPS(2000)._counties)
 
     def test_empty(self):
         assert self.af.get_county_fips('foo', 'bar') is None
         assert self.af.get_county_fips('foo', state='New York') is None
         assert self.af.get_state_fips('foo') is None
         self.assertIsNone(self.af.get_state_fips(None))
+        self.assertIsNone(self.af.get_county_fips(None, 'NY'))
         self.assertEqual(self.af.add_state_fips({"state":"Illinois"}).get("fips"), "17")
 
+    def test_cache(self):
+        af = addfips.AddFIPS(cache_size=2)
+        af.get_county_fips('Kings', 'NY')
+        af.get_county_fips('Kings', 'NY')
+        af.get_county_fips('foo', 'NY')
+        af.get_county_fips('Niagara', 'NY')
+        info = af.cache_info()
+        self.assertEqual((info.hits, info.misses, info.maxsize, info.currsize), (1, 3, 2, 2))
+
+        af.cache_clear()
+        self.assertEqual(af.cache_info().currsize, 0)
+
+        uncached = addfips.AddFIPS(cache_size=0)
+        self.assertEqual(uncached.get_county_fips('Kings', 'NY'), '36047')
+        self.assertEqual(uncached.cache_info().currsize, 0)
+
+    def test_compact(self):
+        compact = addfips.AddFIPS(compact=True)
+        for state_fips, table in self.af._counties.items():
+            self.assertEqual(dict(compact._counties[state_fips]), table)
+
+        self.assertEqual(compact.get_county_fips('Añasco', 'PR'), '72011')
+        self.assertIsNone(compact.get_county_fips('foo', 'NY'))
+        self.assertEqual(compact.get_county_fips('Clifton Forge', 'VA', vintage=2000), '51560')
+        self.assertNotIn('foo', compact._counties['36'])
+        with self.assertRaises(KeyError):
+            compact._counties['36']['foo']  # pylint: disable=pointless-statement
+
+        self.assertLess(compact.table_size(), self.af.table_size())
+
+    def test_compact_only(self):
+        # Loading compact tables doesn't keep the dict tables they were built from.
+        with mock.patch.dict(addfips._TABLES, clear=True), mock.patch.dict(addfips._STATE_TABLES, clear=True):
+            addfips.AddFIPS(compact=True).get_county_fips('Kings', 'NY')
+            self.assertNotIn((addfips.AddFIPS._load_county_data, (2020,)), addfips._TABLES)
+            self.assertIn((addfips.AddFIPS._load_compact_county_data, (2020,)), addfips._TABLES)
+            for tables in addfips._STATE_TABLES.values():
+                for table in tables:
+                    self.assertIsInstance(table, addfips.CompactCountyTable)
+
+    def test_stats(self):
+        self.assertIsNone(self.af.stats)
+
+        af = addfips.AddFIPS(stats=LookupStats())
+        af.get_county_fips('Kings County', 'NY')
+        af.get_county_fips('Kings', 'NY')
+        af.get_county_fips('Saint Clair', 'AL')
+        af.get_county_fips('Añasco', 'PR')
+        af.get_county_fips(None, 'NY')
+        af.get_county_fips('Kings', 'foo')
+        af.get_county_fips_many(['foo', 'foo'], 'NY')
+
+        self.assertEqual((af.stats.hits, af.stats.misses), (4, 4))
+        self.assertEqual(af.stats.reasons, {'none_input': 1, 'unknown_state': 1, 'unknown_county': 2})
+        self.assertEqual(af.stats.rules, {'exact': 1, 'bare': 2, 'abbreviation': 1, 'diacretics': 1})
+        self.assertEqual(sum(af.stats.lookup_times.values()), 8)
+        self.assertEqual(af.stats.as_dict()['hits'], 4)
+        self.assertIn('misses: 4', str(af.stats))
+
+    def test_stats_merge(self):
+        stats, other = LookupStats(), LookupStats()
+        stats.record_lookup(('exact',), 0.000001)
+        other.record_lookup('unknown_county', 0.000003)
+        other.record_load('table', 0.1)
+        stats.merge(other)
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual(stats.lookup_times, {2: 1, 4: 1})
+        self.assertEqual(stats.load_times, [('table', 0.1)])
+
+    def test_delete_diacretics(self):
+        self.assertEqual(self.af._delete_diacretics("añasco"), "anasco")
+        self.assertEqual(self.af._delete_diacretics("manu'a"), "manua")
+
     def test_vintages(self):
         self.assertIn(2000, addfips.COUNTY_FILES)
         self.assertIn(2010, addfips.COUNTY_FILES)
@@ -91,6 +186,19 @@ class TestData(unittest.TestCase):
         assert af2010.get_county_fips('Wade Hampton', 'Alaska') == '02270'
         self.assertIsNone(af2010.get_county_fips('Clifton Forge', 'VA'))
 
+    def test_vintage_lookup(self):
+        self.assertIsNone(self.af.get_county_fips('Clifton Forge', 'VA'))
+        self.assertEqual(self.af.get_county_fips('Clifton Forge', 'VA', vintage=2000), '51560')
+        self.assertEqual(self.af.get_county_fips_many(['Clifton Forge'], 'VA', vintage=2000), ['51560'])
+        self.assertEqual(self.af.match_county_fips('Clifton Forg', 'VA', vintage=2000)[0], '51560')
+        with self.assertRaises(ValueError):
+            self.af.get_county_fips('Kings', 'NY', vintage=1990)
+
+    def test_vintage_shared_states(self):
+        # California's counties are the same in every vintage
+        self.assertIs(self.af._county_table(2000)['06'], self.af._counties['06'])
+        self.assertIsNot(self.af._county_table(2000)['51'], self.af._counties['51'])
+
     def test_vintage2000(self):
         af2000 = addfips.AddFIPS(vintage=2000)
         assert af2000.get_county_fips('Wade Hampton', 'Alaska') == '02270'
@@ -163,6 +271,109 @@ class TestData(unittest.TestCase):
         new = self.af.add_county_fips(self.row, county_field='borough', state_field='statefp')
         assert new['fips'] == '36047'
 
+    def test_get_state_many(self):
+        states = ['New York', 'ny', None, 'foo', 'NY']
+        self.assertEqual(self.af.get_state_fips_many(states), ['36', '36', None, None, '36'])
+        self.assertEqual(self.af.get_state_fips_many(iter(())), [])
+
+    def test_get_county_many(self):
+        counties = ['Kings', 'Niagara', 'Kings', 'Cook', 'foo']
+        states = ['NY', 'New York', 'NY', 'IL', 'NY']
+        self.assertEqual(self.af.get_county_fips_many(counties, states), ['36047', '36063', '36047', '17031', None])
+        self.assertEqual(self.af.get_county_fips_many(counties[:2], 'NY'), ['36047', '36063'])
+
+    def test_many_missing_values(self):
+        # NaN, as pandas and NumPy give for missing values, and other values that aren't strings are None.
+        nan = float('nan')
+        self.assertEqual(self.af.get_state_fips_many(['NY', nan, None, 36]), ['36', None, None, None])
+        fips = self.af.get_county_fips_many(['Kings', 'Kings', nan], ['NY', nan, 'NY'])
+        self.assertEqual(fips, ['36047', None, None])
+        self.assertEqual(self.af.get_county_fips_combined_many(['Kings, NY', nan]), ['36047', None])
+        self.assertIsNone(self.af.get_county_fips(nan, 'NY'))
+        self.assertIsNone(self.af.get_state_fips(36))
+
+    def test_many_lengths(self):
+        with self.assertRaises(ValueError):
+            self.af.get_county_fips_many(['Kings', 'Cook', 'foo'], ['NY', 'IL'])
+        with self.assertRaises(ValueError):
+            self.af.match_county_fips_many(['Kings'], ['NY', 'IL'])
+
+    def test_county_code(self):
+        self.assertEqual(self.af.get_county_fips('047', 'NY'), '36047')
+        self.assertEqual(self.af.get_county_fips('36047', 'NY'), '36047')
+        self.assertEqual(self.af.get_county_fips('36047', None), '36047')
+        self.assertIsNone(self.af.get_county_fips('36047', 'CA'))
+        self.assertIsNone(self.af.get_county_fips('999', 'NY'))
+        self.assertIsNone(self.af.get_county_fips('51560', 'VA'))
+        self.assertEqual(self.af.get_county_fips('51560', 'VA', vintage=2000), '51560')
+
+    def test_county_code_many(self):
+        counties = ['047', 'Kings', '36047', '36047', '047', None]
+        states = ['36', 'NY', 'CA', None, None, 'NY']
+        self.assertEqual(self.af.get_county_fips_many(counties, states), ['36047', '36047', None, '36047', None, None])
+
+    def test_county_code_stats(self):
+        af = addfips.AddFIPS(stats=LookupStats())
+        af.get_county_fips('047', 'NY')
+        af.get_county_fips('999', 'NY')
+        self.assertEqual(af.stats.rules, {'code': 1})
+        self.assertEqual(af.stats.reasons, {'unknown_county': 1})
+
+    def test_combined(self):
+        self.assertEqual(self.af.get_county_fips_combined('Kings County, NY'), '36047')
+        self.assertEqual(self.af.get_county_fips_combined('Orleans Parish LA', ' '), '22071')
+        values = ['Kings County, NY', 'Washington, D.C., DC', '36061', 'Kings', None]
+        self.assertEqual(self.af.get_county_fips_combined_many(values), ['36047', None, '36061', None, None])
+        self.assertEqual(
+            self.af.split_county_state(['Cook County,IL', 'Cook']), (['Cook County', 'Cook'], ['IL', None])
+        )
+
+    def test_state_name(self):
+        self.assertEqual(self.af.get_state_name('36'), 'New York')
+        self.assertEqual(self.af.get_state_name('ny'), 'New York')
+        self.assertEqual(self.af.get_state_postal('72'), 'PR')
+        self.assertEqual(self.af.get_state_postal('Puerto Rico'), 'PR')
+        self.assertIsNone(self.af.get_state_name('foo'))
+        self.assertIsNone(self.af.get_state_postal(None))
+        self.assertEqual(self.af.get_state_name_many(['36', '17', '36']), ['New York', 'Illinois', 'New York'])
+        self.assertEqual(self.af.get_state_postal_many(['36', 'foo']), ['NY', None])
+
+    def test_county_name(self):
+        self.assertEqual(self.af.get_county_name('36047'), 'Kings County')
+        self.assertEqual(self.af.get_county_name('02158'), 'Kusilvak Census Area')
+        self.assertIsNone(self.af.get_county_name('02270'))
+        self.assertEqual(self.af.get_county_name('02270', vintage=2010), 'Wade Hampton census area')
+        self.assertIsNone(self.af.get_county_name(None))
+        names = self.af.get_county_name_many(['36047', '00000', '36047'])
+        self.assertEqual(names, ['Kings County', None, 'Kings County'])
+
+    def test_iter_state(self):
+        rows = [{'state': 'NY'}, {'state': 'foo'}]
+        self.assertEqual([row['fips'] for row in self.af.iter_state_fips(rows)], ['36', None])
+
+        rows = [('x', 'IL'), ('y', 'foo')]
+        self.assertEqual(list(self.af.iter_state_fips(rows, 1)), [('17', 'x', 'IL'), (None, 'y', 'foo')])
+        self.assertEqual(list(self.af.iter_state_fips(rows, 1, unmatched=True)), [('y', 'foo')])
+
+    def test_iter_county(self):
+        rows = iter([['Kings', 'NY'], ['foo', 'NY'], ['Cook', 'IL']])
+        result = self.af.iter_county_fips(rows, county_field=0, state_field=1, append=True)
+        self.assertEqual(next(result), ['Kings', 'NY', '36047'])
+        self.assertEqual(list(result), [['foo', 'NY', None], ['Cook', 'IL', '17031']])
+
+        rows = [('Kings',), ('Niagara',), ('Cook',)]
+        result = self.af.iter_county_fips(rows, county_field=0, state='New York', unmatched=True)
+        self.assertEqual(list(result), [('Cook',)])
+
+        result = self.af.iter_county_fips([dict(self.row)], state_field='statefp')
+        self.assertEqual(next(result)['fips'], '36047')
+
+        # An unknown fixed state matches nothing, rather than falling back to the rows' state fields.
+        result = self.af.iter_county_fips([('Kings',)], county_field=0, state='Nowhere')
+        self.assertEqual(list(result), [(None, 'Kings')])
+        result = self.af.iter_county_fips([dict(self.row)], state='Nowhere')
+        self.assertIsNone(next(result)['fips'])
+
     def test_county_list(self):
         new = self.af.add_county_fips(self.list, county_field=1, state_field=2)
         assert new[0] == '36047'
@@ -186,6 +397,17 @@ class TestData(unittest.TestCase):
         assert self.af.get_county_fips('Beaufort County', 'North Carolina') == '37013'
         assert self.af.get_county_fips('Beauft. County', 'North Carolina') is None
 
+    def test_fuzzy(self):
+        fips, score = self.af.match_county_fips('St Louis Cnty', 'MO')
+        self.assertEqual(fips, '29189')
+        self.assertLess(score, 1)
+        self.assertEqual(self.af.match_county_fips('Los Angelos', 'California')[0], '06037')
+        self.assertEqual(self.af.match_county_fips('Kings', 'NY'), ('36047', 1.0))
+        self.assertEqual(self.af.match_county_fips('Brooklin', 'NY', cutoff=0.95), (None, 0.0))
+        self.assertEqual(self.af.match_county_fips('xyz', 'NY'), (None, 0.0))
+        self.assertEqual(self.af.match_county_fips('Kings', 'foo'), (None, 0.0))
+        self.assertEqual(self.af.match_county_fips(None, 'NY'), (None, 0.0))
+
     def test_district(self):
         assert self.af.get_county_fips("Manu'a District", "60") == "60020"
 
@@ -194,5 +416,219 @@ class TestData(unittest.TestCase):
         self.assertEqual(self.af.get_county_fips("Copper River Census Area", "02"), "02066")
 
 
+class TestThreads(unittest.TestCase):
+    pairs = [('Kings', 'NY'), ('Cook County', 'IL'), ('Añasco', 'PR'), ('foo', 'NY'), ('St. Louis City', 'MO')]
+
+    def test_concurrent_lookups(self):
+        af = addfips.AddFIPS(cache_size=3)
+        expected = [af.get_county_fips(*pair) for pair in self.pairs]
+        af.cache_clear()
+
+        def lookup(_):
+            return [[af.get_county_fips(*pair) for pair in self.pairs] for _ in range(500)]
+
+        with ThreadPoolExecutor(8) as pool:
+            for results in pool.map(lookup, range(16)):
+                self.assertEqual(results, [expected] * 500)
+
+            # Caches belong to threads, so check them while the pool's threads are running.
+            info = af.cache_info()
+            self.assertEqual(info.hits + info.misses, 16 * 500 * len(self.pairs))
+            self.assertLessEqual(info.currsize, 8 * 3)
+
+            af.cache_clear()
+            self.assertEqual(af.cache_info().currsize, 0)
+
+    def test_concurrent_loading(self):
+        addfips._TABLES.pop((addfips.AddFIPS._load_county_data, (2000,)), None)
+        barrier = threading.Barrier(8)
+
+        def load(_):
+            af = addfips.AddFIPS(2000)
+            barrier.wait()
+            return af._counties, af.get_county_fips('Clifton Forge', 'VA')
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(load, range(8)))
+
+        self.assertTrue(all(counties is results[0][0] for counties, _ in results))
+        self.assertEqual({fips for _, fips in results}, {'51560'})
+
+
+class TestOverlay(unittest.TestCase):
+    def setUp(self):
+        self.af = addfips.AddFIPS()
+
+    def test_aliases(self):
+        self.assertIsNone(self.af.get_county_fips('NYC', 'NY'))
+        self.af.add_aliases({'NYC': '36061', 'Kings': '36081'})
+        self.assertEqual(self.af.get_county_fips('nyc', 'New York'), '36061')
+        # Aliases take precedence, only in this instance.
+        self.assertEqual(self.af.get_county_fips('Kings', 'NY'), '36081')
+        self.assertEqual(self.af.get_county_fips('Kings County', 'NY'), '36047')
+        self.assertEqual(addfips.AddFIPS().get_county_fips('Kings', 'NY'), '36047')
+        fips = self.af.get_county_fips_many(['NYC', 'Kings', 'Cook'], ['NY', 'NY', 'IL'])
+        self.assertEqual(fips, ['36061', '36081', '17031'])
+
+    def test_normalized(self):
+        self.af.add_aliases({'Doña Alias County': '35013', 'St. Alias Parish': '22071'})
+        self.assertEqual(self.af.get_county_fips('Dona Alias', 'NM'), '35013')
+        self.assertEqual(self.af.get_county_fips('saint alias', 'LA'), '22071')
+        self.assertEqual(self.af.get_county_fips('St. Alias Parish', 'LA'), '22071')
+
+    def test_incremental(self):
+        tables = dict(addfips._TABLES)
+        self.af.add_aliases({f'Alias {i}': '36047' for i in range(1000)})
+        self.af.add_aliases({'Other': '17031'})
+        self.assertEqual(self.af.get_county_fips('Alias 999', 'NY'), '36047')
+        self.assertEqual(self.af.get_county_fips('Other', 'IL'), '17031')
+        for key, table in tables.items():
+            self.assertIs(addfips._TABLES[key], table)
+
+    def test_load_aliases(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as f:
+            f.write('statefp,countyfp,name\n36,061,NYC\n17,031,Chicagoland\n')
+        self.addCleanup(os.unlink, f.name)
+
+        self.af.load_aliases(f.name)
+        self.assertEqual(self.af.get_county_fips('NYC', 'NY'), '36061')
+        self.assertEqual(self.af.get_county_fips('Chicagoland', 'IL'), '17031')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.af.add_aliases({'NYC': '3606'})
+        with self.assertRaises(ValueError):
+            self.af.add_aliases({'NYC': 'NY061'})
+
+    def test_stats(self):
+        af = addfips.AddFIPS(stats=LookupStats())
+        af.add_aliases({'NYC': '36061'})
+        af.get_county_fips('NYC', 'NY')
+        self.assertEqual(af.stats.rules, {'overlay': 1})
+
+
+class TestCrosswalk(unittest.TestCase):
+    def setUp(self):
+        self.af = addfips.AddFIPS()
+
+    def test_translate_unchanged(self):
+        self.assertEqual(self.af.translate('36047', 2000, 2020), ['36047'])
+        self.assertEqual(self.af.translate('36047', 2020, 2020), ['36047'])
+
+    def test_translate_renamed(self):
+        # Wade Hampton Census Area became Kusilvak Census Area in 2015.
+        self.assertEqual(self.af.translate('02270', 2000, 2020), ['02158'])
+        self.assertEqual(self.af.translate('02158', 2015, 2010), ['02270'])
+
+    def test_translate_merged(self):
+        # Clifton Forge city joined Alleghany County in 2001.
+        self.assertEqual(self.af.translate('51560', 2000, 2010), ['51005'])
+        self.assertEqual(self.af.translate('51005', 2010, 2000), ['51005', '51560'])
+
+    def test_translate_split(self):
+        self.assertEqual(self.af.translate('02201', 2000, 2020), ['02130', '02198', '02275'])
+        # Broomfield was made from parts of four counties.
+        self.assertEqual(self.af.translate('08014', 2010, 2000), ['08001', '08013', '08059', '08123'])
+        self.assertEqual(self.af.translate('08001', 2000, 2010), ['08001', '08014'])
+
+    def test_translate_missing(self):
+        self.assertEqual(self.af.translate('99999', 2000, 2020), [])
+        self.assertEqual(self.af.translate('08014', 2000, 2010), [])
+        with self.assertRaises(ValueError):
+            self.af.translate('36047', 1990, 2020)
+
+    def test_translate_many(self):
+        fips = ['36047', '51560', '02270', None]
+        self.assertEqual(self.af.translate_many(fips, 2000, 2020), [['36047'], ['51005'], ['02158'], []])
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.af = addfips.AddFIPS()
+
+    def test_extract(self):
+        self.assertEqual(self.af.extract_fips('Kings County, New York'), ('36', '36047'))
+        self.assertEqual(self.af.extract_fips('Orleans Parish LA'), ('22', '22071'))
+        self.assertEqual(self.af.extract_fips('Doña Ana County, NM'), ('35', '35013'))
+        self.assertEqual(self.af.extract_fips('St Louis city, Missouri'), ('29', '29510'))
+        self.assertEqual(self.af.extract_fips("Prince George's County, Maryland"), ('24', '24033'))
+
+    def test_extract_prefers_state_name(self):
+        # "in" is also Indiana's postal code.
+        self.assertEqual(self.af.extract_fips('Parish of Orleans in Louisiana'), ('22', '22071'))
+
+    def test_extract_partial(self):
+        self.assertEqual(self.af.extract_fips('Seattle, Washington'), ('53', None))
+        self.assertEqual(self.af.extract_fips('Los Angeles, Texas'), ('48', None))
+        # A city named after another state.
+        self.assertEqual(self.af.extract_fips('Kansas City, MO'), ('29', None))
+        self.assertEqual(self.af.extract_fips('Michigan City, IN'), ('18', None))
+        # A county name found in only one state.
+        self.assertEqual(self.af.extract_fips('Los Angeles'), ('06', '06037'))
+        self.assertEqual(self.af.extract_fips('Kings'), (None, None))
+        self.assertEqual(self.af.extract_fips(''), (None, None))
+        self.assertEqual(self.af.extract_fips(None), (None, None))
+
+    def test_extract_vintage(self):
+        self.assertEqual(self.af.extract_fips('Clifton Forge, VA'), ('51', None))
+        self.assertEqual(self.af.extract_fips('Clifton Forge, VA', vintage=2000), ('51', '51560'))
+        self.assertEqual(addfips.AddFIPS(compact=True).extract_fips('Kings County, NY'), ('36', '36047'))
+
+    def test_extract_many(self):
+        texts = ['Cook County, IL', 'Harris County TX', 'Cook County, IL', 'nowhere']
+        expected = [('17', '17031'), ('48', '48201'), ('17', '17031'), (None, None)]
+        self.assertEqual(self.af.extract_fips_many(texts), expected)
+
+
+class TestPlaces(unittest.TestCase):
+    def setUp(self):
+        self.af = addfips.AddFIPS()
+
+    def tearDown(self):
+        addfips._TABLES.pop((addfips.AddFIPS._load_place_data, (2020,)), None)
+
+    def test_place(self):
+        self.assertEqual(self.af.get_place_fips('Boston', 'MA'), '25025')
+        self.assertEqual(self.af.get_place_fips('Boston city', 'Massachusetts'), '25025')
+        self.assertEqual(self.af.get_place_fips('kansas city', '20'), '20209')
+        self.assertEqual(self.af.get_place_fips('Urban Honolulu', 'HI'), '15003')
+        self.assertEqual(self.af.get_place_fips('Indianapolis', 'IN'), '18097')
+
+    def test_place_several_counties(self):
+        self.assertEqual(self.af.get_place_fips('Kansas City', 'MO'), ['29037', '29047', '29095', '29165'])
+        self.assertEqual(len(self.af.get_place_fips('New York', 'NY')), 5)
+        self.assertEqual(self.af.get_place_fips('Chicago', 'IL'), ['17031', '17043'])
+
+    def test_place_names(self):
+        self.assertEqual(self.af.get_place_fips('Saint Louis', 'MO'), '29510')
+        self.assertEqual(self.af.get_place_fips('Espanola', 'NM'), ['35039', '35049'])
+        self.assertEqual(self.af.get_place_fips('Española', 'NM'), ['35039', '35049'])
+
+    def test_place_missing(self):
+        self.assertIsNone(self.af.get_place_fips('Boston', 'NY'))
+        self.assertIsNone(self.af.get_place_fips('Springfield', 'MA'))
+        self.assertIsNone(self.af.get_place_fips(None, 'MA'))
+        self.assertIsNone(self.af.get_place_fips('Boston', None))
+
+    def test_place_many(self):
+        places = ['Boston', 'Kansas City', 'Boston', None]
+        fips = self.af.get_place_fips_many(places, ['MA', 'MO', 'MA', 'MA'])
+        self.assertEqual(fips, ['25025', ['29037', '29047', '29095', '29165'], '25025', None])
+        self.assertEqual(self.af.get_place_fips_many(['Kansas City'], 'KS'), ['20209'])
+
+    def test_place_data(self):
+        # Every bundled place is in counties that exist.
+        for state_fips, places in self.af._shared_table(self.af._load_place_data, 2020).items():
+            for codes in places.values():
+                for code in codes:
+                    self.assertEqual(code[:2], state_fips)
+                    self.assertIsNotNone(self.af.get_county_name(code))
+
+    def test_place_lazy(self):
+        self.assertNotIn((addfips.AddFIPS._load_place_data, (2020,)), addfips._TABLES)
+        self.af.get_place_fips('Boston', 'MA')
+        self.assertIn((addfips.AddFIPS._load_place_data, (2020,)), addfips._TABLES)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+# pylint: disable=missing-docstring,invalid-name,protected-access
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from unittest import mock
+
+from addfips.addfips import _TABLES, AddFIPS
+from addfips.cache import ResultCache
+from addfips.stats import LookupStats
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = path.join(self.dir.name, 'cache.db')
+        self.cache = ResultCache(self.path, max_entries=3)
+
+    def tearDown(self):
+        self.cache.close()
+        self.dir.cleanup()
+
+    def test_get_set(self):
+        self.cache.set_many('2020', {('Kings', 'NY'): '36047', ('foo', 'NY'): None, (None, 'NY'): None})
+        found = self.cache.get_many('2020', [('Kings', 'NY'), ('foo', 'NY'), ('bar', 'NY'), (None, 'NY')])
+        self.assertEqual(found, {('Kings', 'NY'): '36047', ('foo', 'NY'): None})
+        self.assertEqual(self.cache.get_many('2010', [('Kings', 'NY')]), {})
+        self.assertEqual(len(self.cache), 2)
+
+    def test_shared(self):
+        self.cache.set_many('2020', {('Kings', 'NY'): '36047'})
+        other = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(other.get_many('2020', [('Kings', 'NY')]), {('Kings', 'NY'): '36047'})
+        other.close()
+
+    def test_threads(self):
+        af = AddFIPS(result_cache=self.cache)
+
+        def lookup(i):
+            try:
+                return af.get_county_fips_many(['Kings', str(i % 2)], 'NY')
+            finally:
+                self.cache.close()
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lookup, range(8)))
+
+        self.assertEqual(results, [['36047', None]] * 8)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_eviction(self):
+        for i in range(3):
+            self.cache.set_many('2020', {(str(i), 'NY'): None})
+        # Using the first result makes the second one the least recently used.
+        self.cache.get_many('2020', [('0', 'NY')])
+        self.cache.set_many('2020', {('3', 'NY'): None})
+        self.assertEqual(len(self.cache), 3)
+        found = self.cache.get_many('2020', [(str(i), 'NY') for i in range(4)])
+        self.assertEqual(set(found), {('0', 'NY'), ('2', 'NY'), ('3', 'NY')})
+
+    def test_addfips(self):
+        af = AddFIPS(result_cache=self.cache)
+        namespace = af._namespace(2020)
+        self.assertEqual(af.get_county_fips_many(['Kings', 'foo', 'Kings'], 'NY'), ['36047', None, '36047'])
+        found = self.cache.get_many(namespace, [('Kings', 'NY'), ('foo', 'NY')])
+        self.assertEqual(found, {('Kings', 'NY'): '36047', ('foo', 'NY'): None})
+
+        # Cached results are used without looking them up again.
+        self.cache.set_many(namespace, {('Brooklyn', 'NY'): 'cached'})
+        self.assertEqual(af.get_county_fips_many(['Brooklyn'], 'NY'), ['cached'])
+
+    def test_aliases(self):
+        af = AddFIPS(result_cache=self.cache)
+        self.assertEqual(af.get_county_fips_many(['NYC'], 'NY'), [None])
+        af.add_aliases({'NYC': '36061'})
+        # Results with aliases are kept apart from results without them.
+        self.assertEqual(af.get_county_fips_many(['NYC'], 'NY'), ['36061'])
+        self.assertEqual(AddFIPS(result_cache=self.cache).get_county_fips_many(['NYC'], 'NY'), [None])
+
+    def test_fuzzy(self):
+        af = AddFIPS(result_cache=self.cache)
+        self.assertEqual(af.match_county_fips_many(['Brooklin', 'xyz'], ['NY', 'NY']), ['36047', None])
+        fuzzy, exact = af._namespace(2020, '~0.8'), af._namespace(2020)
+        self.assertEqual(self.cache.get_many(fuzzy, [('Brooklin', 'NY')]), {('Brooklin', 'NY'): '36047'})
+        self.assertEqual(self.cache.get_many(exact, [('Brooklin', 'NY')]), {})
+
+    def test_upgrade(self):
+        # Results stored by another release of addfips, or from other data, aren't used.
+        af = AddFIPS(result_cache=self.cache)
+        namespace = af._namespace(2020)
+        with mock.patch('addfips.__version__', '0.0.0'), mock.patch.dict(_TABLES, clear=True):
+            old = af._namespace(2020)
+
+        self.assertNotEqual(old, namespace)
+        self.cache.set_many(old, {('Kings', 'NY'): 'stale'})
+        self.cache.set_many('2020', {('Kings', 'NY'): 'stale'})
+        self.assertEqual(af.get_county_fips_many(['Kings'], 'NY'), ['36047'])
+
+    def test_stats(self):
+        with self.assertRaises(ValueError):
+            AddFIPS(stats=LookupStats(), result_cache=self.cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,14 +7,23 @@
 # pylint: disable=missing-docstring,invalid-name
 import csv
 import io
+import os
 import subprocess
 import sys
+import tempfile
 import unittest
 from os import path
 
 from addfips import __main__ as addfips_cli
 
 
+def import_times(*modules):
+    """Cumulative import time of each module, in microseconds, as reported by -X importtime in a new interpreter."""
+    cmd = [sys.executable, '-X', 'importtime', '-c', f'import {", ".join(modules)}']
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return {line.split('|')[2].strip(): int(line.split('|')[1]) for line in result.stderr.splitlines()[1:]}
+
+
 class TestCli(unittest.TestCase):
     def setUp(self):
         dirname = path.join(path.dirname(__file__), 'data')
@@ -106,6 +115,178 @@ class TestCli(unittest.TestCase):
         assert row[1] == 'Alabama'
         assert row[0] == '01'
 
+    def test_read_chunks(self):
+        text = 'state,county\nNY,Kings\nNY,"Multi\nline"\nIL,Cook\n'
+        chunks = list(addfips_cli.read_chunks(io.StringIO(text), size=12))
+        self.assertEqual(''.join(chunks), text)
+        self.assertEqual(chunks[1], 'NY,Kings\nNY,"Multi\nline"\n')
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith('\n'))
+
+    def test_converter(self):
+        converter = addfips_cli.Converter(None, state_index=0, county_index=1, err_unmatched=True)
+        out, err, stats = converter('NY,Kings,1\nNY,foo,2\n\nNY\n')
+        self.assertEqual(out, '36047,NY,Kings,1\r\n')
+        self.assertEqual(err, ',NY,foo,2\r\n,NY\r\n')
+        self.assertIsNone(stats)
+
+        converter = addfips_cli.Converter(None, state_index=None, county_index=0, state='Alabama')
+        out, _, _ = converter('Autauga County\n')
+        self.assertEqual(out, '01001,Autauga County\r\n')
+
+        converter = addfips_cli.Converter(None, state_index=1, delimiter='|')
+        out, _, _ = converter('x|IL\n')
+        self.assertEqual(out, '17,x,IL\r\n')
+
+    def test_converter_stats(self):
+        converter = addfips_cli.Converter(None, state_index=0, county_index=1, stats=True)
+        _, _, stats = converter('NY,Kings\nNY,Kings\nNY,foo\n')
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        _, _, stats = converter('NY,Kings\n')
+        self.assertEqual((stats.hits, stats.misses), (1, 0))
+
+    def test_stats_cli(self):
+        args = self.co_args + ['--stats']
+        result = subprocess.run(args, capture_output=True, check=True)
+        self.assertIn(b'lookups: 2', result.stderr)
+        self.assertIn(b'hits: 2', result.stderr)
+
+    def test_fuzzy_cache_cli(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            source, cache = path.join(dirname, 'in.csv'), path.join(dirname, 'cache.db')
+            with open(source, 'w', encoding='utf8') as f:
+                f.write('state,county\nNY,Brooklin\nCA,Los Angelos\n')
+
+            args = ['addfips', source, '-s', 'state', '-c', 'county', '--fuzzy', '0.8', '--cache', cache]
+            first = subprocess.run(args, capture_output=True, check=True)
+            second = subprocess.run(args, capture_output=True, check=True)
+
+        self.assertEqual(first.stdout.splitlines()[1:], [b'36047,NY,Brooklin', b'06037,CA,Los Angelos'])
+        self.assertEqual(first.stdout, second.stdout)
+
+        result = subprocess.run(self.co_args + ['--stats', '--cache', cache], capture_output=True, check=False)
+        self.assertEqual(result.returncode, 2)
+
+    def test_index_dir(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            subprocess.run(['addfips', 'index', dirname, '--vintage', '2020'], capture_output=True, check=True)
+            args = self.co_args + ['--vintage', '2020']
+            indexed = subprocess.run(args + ['--index-dir', dirname, '--jobs', '2'], capture_output=True, check=True)
+            self.assertEqual(os.listdir(dirname), ['counties_2020.idx'])
+
+        self.assertEqual(indexed.stdout, subprocess.run(args, capture_output=True, check=True).stdout)
+        self.assertIn(b'01001,', indexed.stdout)
+
+    def test_err_unmatched(self):
+        # Unmatched rows on stderr keep an empty fips column, so they line up with the header.
+        with tempfile.TemporaryDirectory() as dirname:
+            source = path.join(dirname, 'in.csv')
+            with open(source, 'w', encoding='utf8') as f:
+                f.write('state,county\nNY,Kings\nNY,foo\n')
+
+            args = ['addfips', source, '-s', 'state', '-c', 'county', '-u']
+            result = subprocess.run(args, capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.splitlines(), ['fips,state,county', '36047,NY,Kings'])
+            self.assertEqual(result.stderr.splitlines(), [',NY,foo'])
+
+            args = ['addfips', source, '--no-header', '-s', '1', '-c', '2', '-u']
+            result = subprocess.run(args, capture_output=True, text=True, check=True)
+            self.assertEqual(result.stderr.splitlines(), [',state,county', ',NY,foo'])
+
+    def test_chunk_size(self):
+        for size in ('0', '-1'):
+            result = subprocess.run(self.co_args + ['--chunk-size', size], capture_output=True, check=False)
+            self.assertEqual(result.returncode, 2)
+            self.assertIn(b'--chunk-size', result.stderr)
+
+    def test_column_index(self):
+        self.assertEqual(addfips_cli.column_index('2'), 1)
+        self.assertEqual(addfips_cli.column_index('county', ['state', 'county']), 1)
+        with self.assertRaises(ValueError):
+            addfips_cli.column_index('foo', ['state', 'county'])
+
+    def test_jobs(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('state,county\n')
+            for _ in range(20000):
+                f.write('NY,Kings\nAlabama,Autauga County\nNY,foo\n')
+        self.addCleanup(os.unlink, f.name)
+
+        # Small chunks, so that the input is split between all the workers.
+        args = ['addfips', '-c', 'county', '-s', 'state', '-u', '--chunk-size', '4096']
+        serial = subprocess.run(args + [f.name], capture_output=True, check=True)
+        parallel = subprocess.run(args + [f.name, '--jobs', '3'], capture_output=True, check=True)
+
+        self.assertEqual(serial.stdout, parallel.stdout)
+        self.assertEqual(serial.stderr, parallel.stderr)
+        self.assertEqual(len(parallel.stdout.splitlines()), 40001)
+        self.assertEqual(len(parallel.stderr.splitlines()), 20000)
+        self.assertTrue(parallel.stdout.splitlines()[1].startswith(b'36047,'))
+
+        with open(f.name, 'rb') as stdin:
+            piped = subprocess.run(args + ['--jobs', '3'], stdin=stdin, capture_output=True, check=True)
+
+        self.assertEqual(serial.stdout, piped.stdout)
+        self.assertEqual(serial.stderr, piped.stderr)
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            source, shards = path.join(dirname, 'in.csv'), path.join(dirname, 'out')
+            with open(source, 'w', encoding='utf8') as f:
+                f.write('state,county\nNY,Kings\nCA,Los Angeles\nNY,foo\nXX,Kings\nNew York,Queens\n')
+
+            args = ['addfips', source, '-s', 'state', '-c', 'county', '--shards', shards]
+            subprocess.run(args + ['--jobs', '2', '--chunk-size', '12'], check=True)
+
+            self.assertEqual(sorted(os.listdir(shards)), ['06.csv', '36.csv', 'unknown.csv'])
+            with open(path.join(shards, '36.csv'), encoding='utf8') as f:
+                rows = f.read().splitlines()
+            self.assertEqual(rows, ['fips,state,county', '36047,NY,Kings', ',NY,foo', '36081,New York,Queens'])
+
+            with open(path.join(shards, 'unknown.csv'), encoding='utf8') as f:
+                self.assertEqual(f.read().splitlines(), ['fips,state,county', ',XX,Kings'])
+
+            result = subprocess.run(args + ['-u'], capture_output=True, text=True, check=True)
+            self.assertEqual(result.stderr.splitlines(), [',NY,foo', ',XX,Kings'])
+            self.assertEqual(sorted(os.listdir(shards)), ['06.csv', '36.csv', 'unknown.csv'])
+            with open(path.join(shards, '36.csv'), encoding='utf8') as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+
+    def test_converter_shards(self):
+        converter = addfips_cli.Converter(None, 0, shards=True)
+        out, _, _ = converter('NY\nCalifornia\nfoo\n')
+        self.assertEqual(out, {'36': '36,NY\r\n', '06': '06,California\r\n', None: ',foo\r\n'})
+
+    def test_combined_field(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('place,id\n"Kings County, NY",1\n"Orleans Parish, LA",2\n36061,3\nfoo,4\n')
+        self.addCleanup(os.unlink, f.name)
+
+        result = subprocess.run(['addfips', '-k', 'place', f.name], capture_output=True, text=True, check=True)
+        fips = [line.split(',')[0] for line in result.stdout.splitlines()]
+        self.assertEqual(fips, ['fips', '36047', '22071', '36061', ''])
+
+        result = subprocess.run(['addfips', '-k', 'place', '-c', 'place', f.name], capture_output=True, check=False)
+        self.assertNotEqual(result.returncode, 0)
+
+    def test_import_time(self):
+        # Importing the package shouldn't load the lookup module or read any data.
+        code = 'import sys, addfips; print(" ".join(sorted(sys.modules)))'
+        modules = subprocess.check_output([sys.executable, '-c', code], text=True).split()
+        for module in ('addfips.addfips', 'csv', 'importlib.resources', 'difflib', 'multiprocessing'):
+            self.assertNotIn(module, modules)
+
+        times = import_times('addfips.__main__')
+        self.assertNotIn('multiprocessing', times)
+        self.assertNotIn('sqlite3', times)
+
+        # Compare with the standard library modules the CLI needs, imported on the same machine in the same run.
+        # addfips.__main__ takes about three times as long as them, so this catches a regression to several times that.
+        # The best of a few runs of each smooths over a busy machine.
+        baseline = min(sum(import_times('argparse', 'csv')[m] for m in ('argparse', 'csv')) for _ in range(3))
+        elapsed = min(import_times('addfips.__main__')['addfips.__main__'] for _ in range(3))
+        self.assertLess(elapsed, 8 * baseline)
+
     def test_unmatched(self):
         self.assertTrue(addfips_cli.unmatched({'fips': None}))
         self.assertTrue(addfips_cli.unmatched([None, 'foo']))
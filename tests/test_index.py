@@ -0,0 +1,104 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+# pylint: disable=missing-docstring,invalid-name,protected-access
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from os import path
+from unittest import mock
+
+from addfips import addfips
+from addfips.addfips import AddFIPS
+from addfips.index import CountyIndex, build_index, index_path, main
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.af = AddFIPS(index_dir=self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_lookups(self):
+        self.assertEqual(self.af.get_county_fips('Kings', 'NY'), '36047')
+        self.assertEqual(self.af.get_county_fips('Añasco', 'PR'), '72011')
+        self.assertEqual(self.af.get_county_fips('St. Louis City', 'MO'), '29510')
+        self.assertEqual(self.af.get_county_fips('Clifton Forge', 'VA', vintage=2000), '51560')
+        self.assertIsNone(self.af.get_county_fips('foo', 'NY'))
+        self.assertEqual(self.af.match_county_fips('Kngs', 'NY')[0], '36047')
+        self.assertTrue(path.exists(index_path(self.dir.name, 2020)))
+
+    def test_tables(self):
+        tables = AddFIPS()._counties
+        self.assertEqual(set(self.af._counties), set(tables))
+        for state_fips, table in tables.items():
+            self.assertEqual(dict(self.af._counties[state_fips]), dict(table))
+
+        self.assertNotIn('foo', self.af._counties['36'])
+        self.assertNotIn(None, self.af._counties['36'])
+        with self.assertRaises(KeyError):
+            self.af._counties['36']['foo']  # pylint: disable=pointless-statement
+
+    def test_build(self):
+        filename = path.join(self.dir.name, 'test.idx')
+        build_index(filename, {'01': {'a': '001', 'b': '003', 'é': '005'}, '02': {'a': '002'}})
+        tables = CountyIndex(filename).tables()
+        self.assertEqual(dict(tables['01']), {'a': '001', 'b': '003', 'é': '005'})
+        self.assertEqual(dict(tables['02']), {'a': '002'})
+        self.assertIsNone(tables['02'].get('b'))
+
+    def test_invalid(self):
+        filename = path.join(self.dir.name, 'test.idx')
+        with open(filename, 'wb') as f:
+            f.write(b'not an index')
+        with self.assertRaises(ValueError):
+            CountyIndex(filename)
+
+    def test_stale(self):
+        # An index built from other data is rebuilt.
+        build_index(index_path(self.dir.name, 2020), {'36': {'kings': '061'}})
+        self.assertEqual(self.af.get_county_fips('Kings', 'NY'), '36047')
+        self.assertEqual(self.af.get_county_fips('Cook', 'IL'), '17031')
+        self.assertEqual(CountyIndex(index_path(self.dir.name, 2020)).source, self.af._county_source(2020))
+
+    def test_truncated(self):
+        filename = index_path(self.dir.name, 2020)
+        self.af._build_index(filename, 2020)
+        with open(filename, 'r+b') as f:
+            f.truncate(os.path.getsize(filename) // 2)
+        with self.assertRaises(ValueError):
+            CountyIndex(filename)
+
+        # A truncated index is rebuilt.
+        self.assertEqual(self.af.get_county_fips('Kings', 'NY'), '36047')
+        self.assertEqual(CountyIndex(filename).source, self.af._county_source(2020))
+
+    def test_read_only(self):
+        # A stale index that can't be rebuilt is ignored, and the tables are read from the CSV.
+        build_index(index_path(self.dir.name, 2020), {'36': {'kings': '061'}})
+        with mock.patch.object(AddFIPS, '_build_index', side_effect=PermissionError):
+            self.assertEqual(self.af.get_county_fips('Kings', 'NY'), '36047')
+            self.assertEqual(self.af.get_county_fips('Cook', 'IL'), '17031')
+
+    def test_build_unshared(self):
+        # Building an index doesn't keep the dict tables in the building process.
+        with mock.patch.dict(addfips._TABLES, clear=True), mock.patch.dict(addfips._STATE_TABLES, clear=True):
+            self.af.get_county_fips('Kings', 'NY')
+            self.assertEqual(addfips._STATE_TABLES, {})
+            self.assertNotIn((AddFIPS._load_county_data, (2020,)), addfips._TABLES)
+
+    def test_main(self):
+        directory = path.join(self.dir.name, 'indexes')
+        with contextlib.redirect_stdout(io.StringIO()):
+            main([directory, '-v', '2010'])
+        self.assertEqual(os.listdir(directory), ['counties_2010.idx'])
+
+
+if __name__ == '__main__':
+    unittest.main()
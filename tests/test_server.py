@@ -0,0 +1,97 @@
+# This file is part of addfips.
+# http://github.com/fitnr/addfips
+# Licensed under the GPL-v3.0 license:
+# http://opensource.org/licenses/GPL-3.0
+# Copyright (c) 2016, fitnr <fitnr@fakeisthenewreal>
+# pylint: disable=missing-docstring,invalid-name
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from addfips import server
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = await server.Server().start(port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_county(self):
+        async with server.AsyncClient(port=self.port) as client:
+            codes = await client.get_county_fips_many(['Kings', 'Cook', 'foo'], ['NY', 'IL', 'NY'])
+            self.assertEqual(codes, ['36047', '17031', None])
+            self.assertEqual(await client.get_county_fips('Clifton Forge', 'VA', vintage=2000), '51560')
+            self.assertEqual(await client.get_county_fips_many(['Kings', 'Niagara'], 'New York'), ['36047', '36063'])
+
+    async def test_state(self):
+        async with server.AsyncClient(port=self.port) as client:
+            self.assertEqual(await client.get_state_fips_many(['New York', 'il', None]), ['36', '17', None])
+            self.assertEqual(await client.get_state_fips('PR'), '72')
+
+    async def test_concurrent(self):
+        async with server.AsyncClient(port=self.port) as client:
+            results = await asyncio.gather(*(client.get_county_fips('Kings', 'NY') for _ in range(20)))
+        self.assertEqual(set(results), {'36047'})
+
+    async def test_slow_request(self):
+        # A slow lookup doesn't stop the server from answering other connections.
+        release = threading.Event()
+
+        class SlowServer(server.Server):
+            def county(self, request):
+                release.wait(10)
+                return super().county(request)
+
+        slow_server = await SlowServer().start(port=0)
+        port = slow_server.sockets[0].getsockname()[1]
+        try:
+            async with server.AsyncClient(port=port) as slow, server.AsyncClient(port=port) as fast:
+                pending = asyncio.ensure_future(slow.get_county_fips('Kings', 'NY'))
+                self.assertEqual(await asyncio.wait_for(fast.get_state_fips('NY'), 5), '36')
+                self.assertFalse(pending.done())
+                release.set()
+                self.assertEqual(await pending, '36047')
+        finally:
+            release.set()
+            slow_server.close()
+            await slow_server.wait_closed()
+
+    async def test_errors(self):
+        async with server.AsyncClient(port=self.port) as client:
+            with self.assertRaises(ValueError):
+                await client._request('/nope', {})  # pylint: disable=protected-access
+            with self.assertRaises(ValueError):
+                await client._request('/county', {'counties': ['Kings']})  # pylint: disable=protected-access
+            with self.assertRaises(ValueError):
+                await client.get_county_fips_many(['Kings', 'Cook', 'foo'], ['NY', 'IL'])
+            with self.assertRaises(ValueError):
+                await client.get_county_fips('Kings', 'NY', vintage=1990)
+            # The connection is still usable after errors
+            self.assertEqual(await client.get_state_fips('NY'), '36')
+
+    async def test_too_large(self):
+        async with server.AsyncClient(port=self.port) as client:
+            with mock.patch.object(server, 'MAX_BODY', 10):
+                with self.assertRaises(ValueError):
+                    await client.get_county_fips_many(['Kings', 'Cook'], ['NY', 'IL'])
+            # The server closes the connection after a 413, and the client opens a new one
+            self.assertEqual(await client.get_state_fips('NY'), '36')
+
+    @unittest.skipUnless(hasattr(asyncio, 'start_unix_server'), 'Unix sockets are not available')
+    async def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, 'addfips.sock')
+            unix_server = await server.Server().start(path=path)
+            async with unix_server, server.AsyncClient(path=path) as client:
+                self.assertEqual(await client.get_county_fips('Kings', 'NY'), '36047')
+
+
+if __name__ == '__main__':
+    unittest.main()